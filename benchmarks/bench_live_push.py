@@ -0,0 +1,139 @@
+"""直播间长连接的本地测试：模拟弹幕服务器推送开播事件，测量提醒延迟和断线重连
+
+用法: python benchmarks/bench_live_push.py [直播间数量]
+需要 websockets（nonebot 的 websockets 驱动器依赖它）
+"""
+
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import time
+import zlib
+
+import nonebot
+import websockets
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = free_port()
+nonebot.init(
+    driver="~none+~websockets",
+    ddcheck_live_ws_url=f"ws://127.0.0.1:{PORT}/sub",
+)
+nonebot.load_plugin("nonebot_plugin_ddcheck")
+
+from nonebot_plugin_ddcheck.live_push import (  # noqa: E402
+    OP_AUTH,
+    OP_AUTH_REPLY,
+    OP_HEARTBEAT,
+    OP_HEARTBEAT_REPLY,
+    OP_MESSAGE,
+    PROTOVER_ZLIB,
+    LivePushManager,
+    pack,
+    unpack,
+)
+
+
+class StandInServer:
+    """只实现认证、心跳和消息推送的弹幕服务器"""
+
+    def __init__(self):
+        self.sockets = {}  # room_id -> websocket
+
+    async def handler(self, ws, *_):
+        room_id = None
+        try:
+            async for data in ws:
+                for op, body in unpack(data):
+                    if op == OP_AUTH:
+                        room_id = json.loads(body)["roomid"]
+                        self.sockets[room_id] = ws
+                        await ws.send(pack(OP_AUTH_REPLY, b'{"code":0}'))
+                    elif op == OP_HEARTBEAT:
+                        await ws.send(pack(OP_HEARTBEAT_REPLY, b"\0\0\0\1"))
+        except websockets.ConnectionClosed:
+            pass  # 客户端取消订阅或断线
+        finally:
+            if self.sockets.get(room_id) is ws:
+                del self.sockets[room_id]
+
+    async def push(self, room_id: int, cmd: str):
+        # 和线上一样，把几条消息合并压缩后作为一帧发送
+        body = json.dumps({"cmd": cmd, "sent": time.time()}).encode()
+        noise = json.dumps({"cmd": "DANMU_MSG", "info": []}).encode()
+        inner = pack(OP_MESSAGE, noise, 0) + pack(OP_MESSAGE, body, 0)
+        frame = pack(OP_MESSAGE, zlib.compress(inner), PROTOVER_ZLIB)
+        await self.sockets[room_id].send(frame)
+
+    async def drop_all(self):
+        for ws in list(self.sockets.values()):
+            await ws.close()
+
+
+async def wait_until(predicate, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.01)
+
+
+async def main(count: int):
+    server = StandInServer()
+    lags = []
+    received = {}
+
+    async def on_event(room_id, message):
+        lags.append((time.time() - message["sent"]) * 1000)
+        received.setdefault(room_id, []).append(message["cmd"])
+
+    async with websockets.serve(server.handler, "127.0.0.1", PORT):
+        manager = LivePushManager(on_event)
+        rooms = list(range(1000, 1000 + count))
+
+        start = time.perf_counter()
+        manager.sync(rooms)
+        await wait_until(lambda: all(conn.connected for conn in manager.rooms.values()))
+        print(f"connect {count} rooms: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # 同一直播间重复 sync 不应新建连接
+        manager.sync(rooms + rooms[:10])
+        assert len(manager) == count and len(server.sockets) == count
+
+        for room_id in rooms:
+            await server.push(room_id, "LIVE")
+        await wait_until(lambda: len(lags) == count)
+        print(
+            f"LIVE -> callback: median={statistics.median(lags):.2f}ms "
+            f"max={max(lags):.2f}ms"
+        )
+        assert all(received[room_id] == ["LIVE"] for room_id in rooms)
+
+        start = time.perf_counter()
+        await server.drop_all()
+        await wait_until(lambda: len(server.sockets) == 0, 5)
+        await wait_until(lambda: len(server.sockets) == count)
+        print(f"reconnect after drop: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        lags.clear()
+        for room_id in rooms:
+            await server.push(room_id, "PREPARING")
+        await wait_until(lambda: len(lags) == count)
+        print(f"PREPARING after reconnect: median={statistics.median(lags):.2f}ms")
+
+        manager.sync(rooms[: count // 2])
+        await wait_until(lambda: len(server.sockets) == count // 2, 5)
+        print(f"unsubscribe: {len(manager)} rooms left")
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,59 @@
+"""对比 html_to_pic（冷启动页面）与预热页面池的渲染延迟
+
+用法: python benchmarks/bench_render.py [渲染次数] [vtb 数量]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import nonebot
+
+nonebot.init()
+nonebot.load_plugin("nonebot_plugin_ddcheck")
+
+from nonebot_plugin_ddcheck.render import PagePool, render_html  # noqa: E402
+
+
+def sample_info(vtbs_num: int) -> dict:
+    vtbs = [
+        {"name": f"VTuber{i}", "uid": 10000 + i, "medal": {}} for i in range(vtbs_num)
+    ]
+    return {
+        "name": "bench",
+        "uid": 1,
+        "face": "",
+        "fans": 0,
+        "follows": vtbs_num,
+        "percent": f"vtb-100.00%({vtbs_num})",
+        "vtbs": vtbs,
+        "num_per_col": min(vtbs_num, 100) or 1,
+    }
+
+
+async def measure(label: str, runs: int, func):
+    costs = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        costs.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:>6}: p50={statistics.median(costs):.1f}ms "
+        f"mean={statistics.mean(costs):.1f}ms max={max(costs):.1f}ms"
+    )
+
+
+async def main(runs: int, vtbs_num: int):
+    info = sample_info(vtbs_num)
+    pool = PagePool(size=1, max_uses=runs + 1)
+    await pool.warm()
+    await measure("cold", runs, lambda: render_html(info, pool=None))
+    await measure("warm", runs, lambda: render_html(info, pool=pool))
+    await pool.close()
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    vtbs_num = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(runs, vtbs_num))
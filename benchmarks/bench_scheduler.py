@@ -0,0 +1,96 @@
+"""开播提醒调度器的规模测试：大量待发提醒下的内存、改期耗时与触发延迟
+
+用法: python benchmarks/bench_scheduler.py [提醒数量]
+任一项超出下面的上限时以 AssertionError 退出
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import nonebot
+
+nonebot.init()
+nonebot.load_plugin("nonebot_plugin_ddcheck")
+
+from nonebot_plugin_ddcheck.notify import NotifyScheduler  # noqa: E402
+
+# 每条提醒的内存上限；改期多少次都不应超过
+MAX_BYTES_PER_ENTRY = 2048
+# 改期轮次之间单次耗时的最大比值，堆不膨胀时各轮应基本持平
+MAX_ROUND_RATIO = 3
+# 3 秒内的触发延迟与 CPU 上限
+MAX_LAG_MS = 100
+MAX_CPU_MS = 1000
+
+
+async def main(count: int):
+    lags = []
+
+    async def send(entry):
+        lags.append((time.time() - entry["release_time"]) * 1000)
+
+    scheduler = NotifyScheduler(send)
+    scheduler.path = Path(tempfile.mkdtemp()) / "timers.json"
+    now = time.time()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(count):
+        scheduler.schedule(i, f"vtb{i}", now + random.uniform(3600, 86400), "url", [1])
+    cost = (time.perf_counter() - start) / count * 1e6
+    print(f"schedule: {cost:.1f}us/op, heap={len(scheduler.heap)}")
+
+    rounds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(count):
+            scheduler.schedule(
+                i, f"vtb{i}", now + random.uniform(3600, 86400), "url", [1]
+            )
+        rounds.append((time.perf_counter() - start) / count * 1e6)
+    print(
+        f"reschedule: {statistics.mean(rounds):.1f}us/op "
+        f"(rounds {', '.join(f'{cost:.1f}' for cost in rounds)}), "
+        f"heap={len(scheduler.heap)}"
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: current={current / 1024:.0f}KiB peak={peak / 1024:.0f}KiB")
+
+    # 惰性删除的堆项会被定期重建，堆大小与条目数同阶
+    assert len(scheduler) == count
+    assert len(scheduler.heap) <= 2 * count + 65, len(scheduler.heap)
+    assert max(rounds) <= MAX_ROUND_RATIO * min(rounds), rounds
+    assert peak <= MAX_BYTES_PER_ENTRY * count, f"{peak / count:.0f}B/entry"
+
+    start = time.perf_counter()
+    scheduler.save(force=True)
+    print(f"save: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # 一部分提醒在接下来两秒内到期，测量触发延迟与空转 CPU
+    due = min(count, 1000)
+    for i in range(due):
+        scheduler.schedule(i, f"vtb{i}", time.time() + random.uniform(0.1, 2), "", [1])
+    task = asyncio.create_task(scheduler.run())
+    cpu = time.process_time()
+    await asyncio.sleep(3)
+    task.cancel()
+    cpu = (time.process_time() - cpu) * 1000
+    assert lags, "no notification fired within 3s"
+    print(
+        f"fired {len(lags)}/{due}: lag p50={statistics.median(lags):.1f}ms "
+        f"max={max(lags):.1f}ms, cpu={cpu:.0f}ms over 3s, pending={len(scheduler)}"
+    )
+    assert len(lags) == due, f"only {len(lags)}/{due} fired"
+    assert statistics.median(lags) <= MAX_LAG_MS
+    assert cpu <= MAX_CPU_MS
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,104 @@
+"""对比 YouTube 直播预约的两种获取方式
+
+离线: python benchmarks/bench_youtube.py [FIXTURE_DIR]
+    对 FIXTURE_DIR（默认 benchmarks/fixtures）下的 /streams 页面（*.html）分别运行
+    快速解析与 yt_dlp 解析，比较耗时、CPU 时间和结果；yt_dlp 的网络请求被替换为读取页面
+在线: python benchmarks/bench_youtube.py --live @handle1 @handle2 ...
+    对每个频道分别测量快速路径与 yt_dlp 路径的耗时和 CPU 时间
+"""
+
+import asyncio
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import nonebot
+import yt_dlp
+from yt_dlp.networking import Response
+
+nonebot.init()
+nonebot.load_plugin("nonebot_plugin_ddcheck")
+
+from nonebot_plugin_ddcheck.follow import (  # noqa: E402
+    fetch_youtube_upcoming,
+    get_upcoming_youtube_live_ytdlp,
+    parse_upcoming_streams,
+)
+
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+
+def serve_fixture(html: str):
+    """让 yt_dlp 的请求直接返回录制的页面，其他请求按离线失败处理"""
+
+    def urlopen(self, req):
+        url = req if isinstance(req, str) else req.url
+        if not url.endswith("/streams"):
+            raise yt_dlp.utils.DownloadError(f"offline: {url}")
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        return Response(io.BytesIO(html.encode("utf-8")), url, headers)
+
+    yt_dlp.YoutubeDL.urlopen = urlopen
+
+
+async def bench_fixtures(fixture_dir: Path, rounds: int = 20):
+    files = sorted(fixture_dir.glob("*.html"))
+    assert files, f"no fixtures in {fixture_dir}"
+    for file in files:
+        html = file.read_text(encoding="utf-8")
+        serve_fixture(html)
+
+        async def fast(_):
+            return parse_upcoming_streams(html)
+
+        results = {}
+        paths = (("fast", fast), ("yt_dlp", get_upcoming_youtube_live_ytdlp))
+        for label, func in paths:
+            walls, cpus = [], []
+            for _ in range(rounds):
+                wall, cpu, results[label] = await timed(func, "@fixture")
+                walls.append(wall)
+                cpus.append(cpu)
+            print(
+                f"{file.name} {label:>6}: wall p50={statistics.median(walls):.2f}ms "
+                f"cpu p50={statistics.median(cpus):.2f}ms -> {results[label]}"
+            )
+        # 两条路径对同一页面必须给出相同的预约
+        assert results["fast"] == results["yt_dlp"], results
+
+
+async def timed(func, ytber):
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        result = await func(ytber)
+    except Exception as e:
+        result = repr(e)
+    # yt_dlp 在线程里运行，process_time 统计的是整个进程的 CPU 时间
+    return (
+        (time.perf_counter() - wall) * 1000,
+        (time.process_time() - cpu) * 1000,
+        result,
+    )
+
+
+async def bench_live(ytbers):
+    for ytber in ytbers:
+        for label, func in (
+            ("fast", fetch_youtube_upcoming),
+            ("yt_dlp", get_upcoming_youtube_live_ytdlp),
+        ):
+            wall, cpu, result = await timed(func, ytber)
+            print(f"{ytber} {label:>6}: wall={wall:.0f}ms cpu={cpu:.0f}ms -> {result}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--live":
+        asyncio.run(bench_live(sys.argv[2:]))
+    elif len(sys.argv) <= 2 and "--help" not in sys.argv:
+        fixture_dir = Path(sys.argv[1]) if len(sys.argv) == 2 else FIXTURE_DIR
+        asyncio.run(bench_fixtures(fixture_dir))
+    else:
+        print(__doc__)
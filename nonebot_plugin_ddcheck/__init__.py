@@ -8,7 +8,6 @@ from pathlib import Path
 
 import nonebot
 import requests
-import yt_dlp
 from moviepy import VideoFileClip
 from nonebot import get_bot, get_driver, on_command, require
 from nonebot.adapters import Message
@@ -26,11 +25,14 @@ from nonebot.plugin import PluginMetadata, inherit_supported_adapters
 
 from .follow import (
     check_timers,
+    get_bili_schedule,
     get_formatted_time_left,
-    get_upcoming_bili_live,
-    get_upcoming_youtube_live,
-    timers,
-    update_timers,
+    get_live_schedule,
+    notify_scheduler,
+    poll_scheduler,
+    start_notifier,
+    update_bili_timer,
+    update_ytb_timer,
 )
 from .twits import get_tweets
 
@@ -42,6 +44,7 @@ require("nonebot_plugin_localstore")
 import nonebot_plugin_localstore as store
 from nonebot_plugin_alconna import UniMessage
 
+from .cache import cache_stats
 from .config import Config
 from .data_source import get_reply, load_json
 from .llm import openai_completion
@@ -67,15 +70,7 @@ vtb_file: Path = store.get_data_file("nonebot_plugin_ddcheck", "vtb.json")
 ytb_file: Path = store.get_data_file("nonebot_plugin_ddcheck", "ytb.json")
 bind_file: Path = store.get_data_file("nonebot_plugin_ddcheck", "bind.json")
 member_file: Path = store.get_data_file("nonebot_plugin_ddcheck", "member.json")
-
-ydl_opts = {
-    "flat_playlist": True,
-    "skip_download": True,
-    "playlistend": 1,
-    "extract_flat": True,
-    "format": "json",
-    "quiet": True,
-}
+timer_file: Path = store.get_data_file("nonebot_plugin_ddcheck", "timers.json")
 
 ban_words = ["sb", "母狗", "沐勾"]
 
@@ -115,6 +110,10 @@ async def run_with_retry(coro_factory, name):
 async def _():
     bot = get_bot()
 
+    if start_notifier(bot, bind_data, timer_file):
+        asyncio.create_task(run_with_retry(notify_scheduler.run, "notify_scheduler"))
+        logger.info("Created notify_scheduler task")
+
     if not _task_running["check_timers"]:
         _task_running["check_timers"] = True
         asyncio.create_task(
@@ -145,6 +144,7 @@ vtbrm = on_command("vtbrm", block=True, priority=12)
 ytbrm = on_command("ytbrm", block=True, priority=12)
 alldd = on_command("alldd", block=True, priority=12)
 rmdd = on_command("rmdd", block=True, priority=12)
+ddstats = on_command("ddstats", block=True, priority=12)
 whenlive = on_command(
     "主包什么时候播",
     aliases={
@@ -411,9 +411,8 @@ async def handle_binddd(
         targets.append(target_qq)
         bind_data.append({"group_id": group_id, "target_qq": str(target_qq)})
 
-        # 保存到bind.json
+        # 保存到bind.json，提醒发送时读取最新的绑定，无需刷新计时器
         save_json(bind_file, bind_data)
-        await update_timers(bot, vtb_data, ytb_data, bind_data)
         await matcher.finish(at_message + " 绑定成功，回复TD不退订")
     else:
         await matcher.finish(at_message + " 已经绑定了")
@@ -440,7 +439,6 @@ async def handle_bindrm(
         if item["group_id"] == group_id and item["target_qq"] == target_qq:
             bind_data.remove(item)
             save_json(bind_file, bind_data)
-            await update_timers(bot, vtb_data, ytb_data, bind_data)
             await matcher.finish(at_message + "解绑成功")
 
     await matcher.finish(at_message + "并没有绑定")
@@ -466,7 +464,13 @@ async def handle_ddcheck(matcher: Matcher, msg: Message = CommandArg()):
         result = await get_reply(text)
         if isinstance(result, str):
             await matcher.finish(result)
-        await UniMessage.image(raw=result).send()
+        if isinstance(result, list):
+            message = UniMessage()
+            for image in result:
+                message += UniMessage.image(raw=image)
+            await message.send()
+        else:
+            await UniMessage.image(raw=result).send()
     except Exception:
         logger.warning(traceback.format_exc())
         await matcher.finish("出错了，请稍后再试")
@@ -527,19 +531,27 @@ async def handle_add(
     data = ytb_data if is_youtube else vtb_data
     file = ytb_file if is_youtube else vtb_file
 
+    async def poll(item):
+        # 只轮询这一个频道，并顺便更新它的提醒
+        if is_youtube:
+            poll_scheduler.charge()
+            live_info = await update_ytb_timer(get_bot(), item, bind_data)
+            # 告诉调度器这次已经轮询过，避免下一轮立刻重复轮询
+            poll_scheduler.polled(item["id"], live_info)
+            return live_info
+        return await update_bili_timer(get_bot(), item, bind_data)
+
     for item in data:
         if item["id" if is_youtube else "uid"] == id:
+            # 已有提醒时直接使用，不再访问网络
+            live_info = notify_scheduler.get(id)
             if group_id not in item["sub_group"]:
                 item["sub_group"].append(group_id)
                 save_json(file, data)
-                live_info = await (
-                    get_upcoming_youtube_live if is_youtube else get_upcoming_bili_live
-                )(id)
-                await handle_live_info(live_info)
+                notify_scheduler.update_groups(id, item["sub_group"])
+                await handle_live_info(live_info or await poll(item))
             else:
-                live_info = await (
-                    get_upcoming_youtube_live if is_youtube else get_upcoming_bili_live
-                )(id)
+                live_info = live_info or await poll(item)
                 if live_info:
                     formatted_time_left = get_formatted_time_left(
                         live_info["release_time"]
@@ -553,28 +565,24 @@ async def handle_add(
                     )
             return
 
+    item = {
+        "nickname": nickname,
+        "id" if is_youtube else "uid": id,
+        "sub_group": [group_id],
+    }
     if is_youtube:
-        url = f"https://www.youtube.com/{id}/streams"
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            result = ydl.extract_info(url, download=False)
-        if not result:
+        # 一次请求同时完成频道存在性检查和直播信息获取
+        try:
+            live_info = await poll(item)
+        except Exception:
+            logger.warning(traceback.format_exc())
             await matcher.finish("频道不存在")
-
-    data.append(
-        {
-            "nickname": nickname,
-            "id" if is_youtube else "uid": id,
-            "sub_group": [group_id],
-        }
-    )
-    save_json(file, data)
-
-    bot = get_bot()
-    await update_timers(bot, vtb_data, ytb_data, bind_data)
-
-    live_info = await (
-        get_upcoming_youtube_live if is_youtube else get_upcoming_bili_live
-    )(id)
+        data.append(item)
+        save_json(file, data)
+    else:
+        data.append(item)
+        save_json(file, data)
+        live_info = await poll(item)
     await handle_live_info(live_info)
 
 
@@ -598,6 +606,17 @@ async def handle_alldd(matcher: Matcher):
     await matcher.finish(text)
 
 
+@ddstats.handle()
+async def handle_ddstats(matcher: Matcher, event: MessageEvent):
+    if str(event.user_id) not in superusers:
+        await matcher.finish("你不是管理员，离开")
+    text = "\n".join(
+        f"{name}: " + ", ".join(f"{key}={value}" for key, value in stats.items())
+        for name, stats in cache_stats().items()
+    )
+    await matcher.finish(text)
+
+
 @rmdd.handle()
 async def handle_rmdd(matcher: Matcher, msg: Message = CommandArg()):
     text = msg.extract_plain_text().strip()
@@ -615,18 +634,14 @@ async def handle_rmdd(matcher: Matcher, msg: Message = CommandArg()):
 @whenlive.handle()
 async def handle_whenlive(bot: Bot, matcher: Matcher, msg: Message = CommandArg()):
     records = []
-    # for item in vtb_data:
-    #     live_info = await get_upcoming_bili_live(item["uid"])
-    #     logger.info(live_info)
-    #     if live_info:
-    #         records.append(
-    #             f"{item['nickname']}{get_formatted_time_left(live_info['release_time'])}(bilibili)"
-    #         )
-    #     else:
-    #         records.append(f"{item['nickname']}还没有发布bilibili的直播预告")
-    for item in ytb_data:
-        live_info = await get_upcoming_youtube_live(item["id"])
-        logger.info(live_info)
+    for item, live_info in await get_bili_schedule(bot, vtb_data, bind_data):
+        if live_info:
+            records.append(
+                f"{item['nickname']}{get_formatted_time_left(live_info['release_time'])}(bilibili)\n{live_info['title']}"
+            )
+        else:
+            records.append(f"{item['nickname']}还没有发布bilibili的直播预告")
+    for item, live_info in await get_live_schedule(bot, ytb_data, bind_data):
         if live_info:
             records.append(
                 f"{item['nickname']}{get_formatted_time_left(live_info['release_time'])}(youtube)\n{live_info['title']}"
@@ -634,7 +649,6 @@ async def handle_whenlive(bot: Bot, matcher: Matcher, msg: Message = CommandArg(
         else:
             records.append(f"{item['nickname']}还没有发布youtube的直播预告")
     logger.info(records)
-    await update_timers(bot, vtb_data, ytb_data, bind_data)
     if not records:
         await matcher.finish("还没有关注任何人呢，杂古")
     await matcher.finish("\n".join(records))
@@ -0,0 +1,254 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from nonebot.log import logger
+from nonebot_plugin_localstore import get_cache_dir
+
+from .config import ddcheck_config
+from .utils import SingleFlight, run_background
+
+cache_path = get_cache_dir("nonebot_plugin_ddcheck")
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """带过期时间的内存缓存，值可以是 None（用于缓存“查无此人”）"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if len(self._data) >= self.maxsize and key not in self._data:
+            # 先清理过期项，仍然满了就丢掉最早写入的
+            now = time.monotonic()
+            for k in [k for k, (expire, _) in self._data.items() if expire < now]:
+                del self._data[k]
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+
+class SWRCache:
+    """过期后仍在 stale 时间内返回旧值，同时后台刷新"""
+
+    def __init__(self, ttl: float, stale: float, maxsize: int = 4096):
+        self.ttl = ttl
+        self.stale = stale
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        item = self._data.get(key)
+        if item is not None:
+            age = time.monotonic() - item[0]
+            if age < self.ttl:
+                self.hits += 1
+                return item[1]
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                if not self._flight.running(key):
+                    run_background(self._refresh(key, fetch))
+                return item[1]
+        self.misses += 1
+        return await self._refresh(key, fetch)
+
+    async def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        async def load():
+            value = await fetch()
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic(), value)
+            return value
+
+        return await self._flight.do(key, load)
+
+
+class FollowCache:
+    """按 uid 持久化的关注列表，列表按关注时间从新到旧排列
+
+    超过 stale 时间的条目不会再被使用，读取时删除，写入时定期清扫整个目录。
+    """
+
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path: Path, stale: float):
+        self.path = path
+        self.stale = stale
+        self._entries: Dict[int, dict] = {}
+        self._pruned_at = 0.0
+
+    def _file(self, uid: int) -> Path:
+        return self.path / f"{uid}.json"
+
+    def get(self, uid: int) -> Optional[dict]:
+        entry = self._entries.get(uid)
+        if entry is None:
+            file = self._file(uid)
+            if not file.exists():
+                return None
+            try:
+                with file.open("r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                logger.warning(f"关注列表缓存 {file} 解析错误，已忽略")
+                return None
+        if self.age(entry) >= self.stale:
+            self._entries.pop(uid, None)
+            self._file(uid).unlink(missing_ok=True)
+            return None
+        self._entries[uid] = entry
+        return entry
+
+    def set(self, uid: int, follows: List[int], total: int):
+        entry = {"time": time.time(), "total": total, "follows": follows}
+        self._entries[uid] = entry
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file(uid).open("w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        if time.time() - self._pruned_at > self.PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        now = time.time()
+        self._pruned_at = now
+        expired = [uid for uid, e in self._entries.items() if self.age(e) >= self.stale]
+        for uid in expired:
+            del self._entries[uid]
+        # 按文件修改时间判断，避免逐个解析 json
+        for file in self.path.glob("*.json"):
+            try:
+                if now - file.stat().st_mtime >= self.stale:
+                    file.unlink()
+            except OSError:
+                continue
+
+    @staticmethod
+    def age(entry: dict) -> float:
+        return time.time() - entry["time"]
+
+
+follow_cache = FollowCache(
+    cache_path / "follows", ddcheck_config.ddcheck_follow_stale
+)
+name_cache = TTLCache()
+user_card_cache = SWRCache(
+    ddcheck_config.ddcheck_card_ttl, ddcheck_config.ddcheck_swr_stale
+)
+medal_cache = SWRCache(
+    ddcheck_config.ddcheck_medal_ttl, ddcheck_config.ddcheck_swr_stale
+)
+
+
+class ImageCache:
+    """按内容哈希存放渲染好的图片，超出容量时淘汰最久未使用的"""
+
+    def __init__(self, path: Path, max_bytes: int, suffix: str = ".png"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        if self._index is None:
+            self._index = {}
+            if self.path.exists():
+                for file in self.path.iterdir():
+                    if file.suffix != self.suffix:
+                        # 旧版本留下的其他格式文件，不再使用
+                        file.unlink(missing_ok=True)
+                        continue
+                    stat = file.stat()
+                    self._index[file.stem] = (stat.st_size, stat.st_mtime)
+        return self._index
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        index = self._load_index()
+        if key not in index:
+            self.misses += 1
+            return None
+        file = self._file(key)
+        try:
+            data = file.read_bytes()
+            os.utime(file)
+        except OSError:
+            index.pop(key, None)
+            self.misses += 1
+            return None
+        index[key] = (len(data), time.time())
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes):
+        index = self._load_index()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._file(key).write_bytes(data)
+        index[key] = (len(data), time.time())
+        self._evict()
+
+    def _evict(self):
+        index = self._load_index()
+        total = sum(size for size, _ in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._file(key).unlink(missing_ok=True)
+            del index[key]
+            total -= size
+
+
+image_cache = ImageCache(
+    cache_path / "images", ddcheck_config.ddcheck_image_cache_size * 1024 * 1024
+)
+# 头像等素材，存的是可以直接内联进模板的 data URI
+asset_cache = ImageCache(
+    cache_path / "assets",
+    ddcheck_config.ddcheck_asset_cache_size * 1024 * 1024,
+    suffix=".uri",
+)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    stats = {
+        "name": {"hits": name_cache.hits, "misses": name_cache.misses},
+        "image": {"hits": image_cache.hits, "misses": image_cache.misses},
+        "asset": {"hits": asset_cache.hits, "misses": asset_cache.misses},
+    }
+    for label, cache in (("card", user_card_cache), ("medal", medal_cache)):
+        stats[label] = {
+            "hits": cache.hits,
+            "stale_hits": cache.stale_hits,
+            "misses": cache.misses,
+        }
+    return stats
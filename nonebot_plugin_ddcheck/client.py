@@ -0,0 +1,66 @@
+from typing import Dict
+from urllib.parse import urlparse
+
+import httpx
+from nonebot import get_driver
+from nonebot.log import logger
+
+from .config import ddcheck_config
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Referer": "https://www.bilibili.com/",
+    "Accept": "application/json, text/plain, */*",
+}
+
+# 每个上游域名一个长连接池，插件内共享
+clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_enabled() -> bool:
+    if not ddcheck_config.ddcheck_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("ddcheck_http2 已开启但未安装 h2，回退到 HTTP/1.1")
+        return False
+    return True
+
+
+def _new_client(host: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=ddcheck_config.ddcheck_max_connections,
+        max_keepalive_connections=ddcheck_config.ddcheck_max_connections,
+        keepalive_expiry=60,
+    )
+    return httpx.AsyncClient(
+        headers=DEFAULT_HEADERS,
+        limits=limits,
+        timeout=10,
+        http2=_http2_enabled(),
+        follow_redirects=True,
+    )
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    host = urlparse(url).netloc or url
+    client = clients.get(host)
+    if client is None or client.is_closed:
+        client = clients[host] = _new_client(host)
+    return client
+
+
+driver = get_driver()
+
+
+@driver.on_startup
+async def _():
+    get_client("api.bilibili.com")
+
+
+@driver.on_shutdown
+async def _():
+    for client in list(clients.values()):
+        await client.aclose()
+    clients.clear()
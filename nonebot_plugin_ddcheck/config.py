@@ -1,14 +1,41 @@
 from nonebot import get_plugin_config
 from pydantic import BaseModel
 from pathlib import Path
+from typing import List
 import jinja2
 
 
 class Config(BaseModel):
     bilibili_cookie: str = ""
+    bilibili_cookies: List[str] = []
     openai_api_key: str = ""
     openai_base_url: str = ""
     tweet_api_key: str = ""
+    ddcheck_follow_concurrency: int = 4
+    ddcheck_follow_ttl: int = 600
+    ddcheck_follow_stale: int = 86400
+    ddcheck_card_ttl: int = 600
+    ddcheck_medal_ttl: int = 1800
+    ddcheck_swr_stale: int = 86400
+    ddcheck_name_ttl: int = 86400
+    ddcheck_name_negative_ttl: int = 600
+    ddcheck_image_cache_size: int = 64  # MB
+    ddcheck_asset_cache_size: int = 16  # MB
+    ddcheck_render_concurrency: int = 2
+    ddcheck_render_recycle: int = 50
+    ddcheck_tile_size: int = 300  # 每张图最多的 vtb 数，0 为不分块
+    ddcheck_ytdlp_workers: int = 4
+    ddcheck_ytdlp_timeout: int = 60
+    ddcheck_poll_concurrency: int = 4
+    ddcheck_poll_timeout: int = 90
+    ddcheck_poll_budget: int = 120  # 每小时最多轮询次数
+    ddcheck_poll_burst: int = 0  # 轮询预算的突发容量，0 表示等于频道数
+    ddcheck_schedule_max_age: int = 3600
+    ddcheck_bili_poll_interval: int = 300
+    ddcheck_live_push: bool = False
+    ddcheck_live_ws_url: str = ""  # 留空时从 getDanmuInfo 获取弹幕服务器
+    ddcheck_http2: bool = False
+    ddcheck_max_connections: int = 10
 
 
 ddcheck_config = get_plugin_config(Config)
@@ -0,0 +1,71 @@
+import time
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional
+
+from nonebot.log import logger
+
+from .config import ddcheck_config
+
+
+class Credential:
+    def __init__(self, index: int, raw_cookie: str):
+        self.index = index
+        cookie = SimpleCookie()
+        cookie.load(raw_cookie)
+        self.cookies: Dict[str, str] = {
+            key: value.value for key, value in cookie.items()
+        }
+        self.cooldown_until = 0.0
+        self.strikes = 0
+        self.last_used = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if not self.cookies:
+            return {}
+        return {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())}
+
+    def __repr__(self) -> str:
+        return f"<Credential #{self.index}>"
+
+
+class CredentialPool:
+    """多个B站账号轮流使用，触发风控的账号冷却一段时间"""
+
+    def __init__(self, raw_cookies: List[str]):
+        raw_cookies = [raw for raw in raw_cookies if raw.strip()] or [""]
+        self.credentials = [Credential(i, raw) for i, raw in enumerate(raw_cookies)]
+
+    def __len__(self) -> int:
+        return len(self.credentials)
+
+    def healthy(self) -> List[Credential]:
+        return [cred for cred in self.credentials if cred.healthy]
+
+    def acquire(self) -> Credential:
+        # 在健康的账号中取最久未用的；全部冷却时取最早恢复的
+        candidates = self.healthy()
+        if candidates:
+            cred = min(candidates, key=lambda cred: cred.last_used)
+        else:
+            cred = min(self.credentials, key=lambda cred: cred.cooldown_until)
+        cred.last_used = time.monotonic()
+        return cred
+
+    def report_ok(self, cred: Credential):
+        cred.strikes = 0
+
+    def report_risk(self, cred: Credential, retry_after: Optional[float] = None):
+        cred.strikes += 1
+        cooldown = retry_after or min(30 * 2 ** (cred.strikes - 1), 1800)
+        cred.cooldown_until = time.monotonic() + cooldown
+        logger.warning(f"{cred} 触发风控，冷却 {cooldown:.0f}s")
+
+
+credential_pool = CredentialPool(
+    [*ddcheck_config.bilibili_cookies, ddcheck_config.bilibili_cookie]
+)
@@ -1,187 +1,203 @@
+import asyncio
 import json
 import math
 import traceback
-from http.cookies import SimpleCookie
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 import bilireq
-import httpx
-import jinja2
 from bilireq.utils import get_homepage_cookies
 from nonebot.log import logger
-from nonebot_plugin_apscheduler import scheduler
-from nonebot_plugin_htmlrender import html_to_pic
-from nonebot_plugin_localstore import get_cache_dir
 
+from .cache import (
+    MISSING,
+    follow_cache,
+    medal_cache,
+    name_cache,
+    user_card_cache,
+)
+from .client import get_client
 from .config import ddcheck_config
+from .credentials import Credential, credential_pool
+from .ratelimit import check_risk, limited
+from .render import inline_image, render_info
+from .utils import SingleFlight, run_background
+from .vtb_list import get_vtb_registry
 
-data_path = get_cache_dir("nonebot_plugin_ddcheck")
-vtb_list_path = data_path / "vtb_list.json"
-
-dir_path = Path(__file__).parent
-template_path = dir_path / "template"
-env = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(template_path), enable_async=True
-)
 
-raw_cookie = ddcheck_config.bilibili_cookie
-cookie = SimpleCookie()
-cookie.load(raw_cookie)
-cookies = {key: value.value for key, value in cookie.items()}
-
-
-async def update_vtb_list():
-    vtb_list = []
-    urls = [
-        "https://api.vtbs.moe/v1/short",
-        "https://cfapi.vtbs.moe/v1/short",
-        "https://hkapi.vtbs.moe/v1/short",
-        "https://kr.vtbs.moe/v1/short",
-    ]
-    async with httpx.AsyncClient() as client:
-        for url in urls:
-            try:
-                resp = await client.get(url, timeout=20)
-                result = resp.json()
-                if not result:
-                    continue
-                for info in result:
-                    if info.get("uid", None) and info.get("uname", None):
-                        vtb_list.append(
-                            {"mid": int(info["uid"]), "uname": info["uname"]}
-                        )
-                    if info.get("mid", None) and info.get("uname", None):
-                        vtb_list.append(info)
-                break
-            except httpx.TimeoutException:
-                logger.warning(f"Get {url} timeout")
-            except Exception:
-                logger.exception(f"Error when getting {url}, ignore")
-    dump_vtb_list(vtb_list)
-
-
-scheduler.add_job(
-    update_vtb_list,
-    "cron",
-    hour=3,
-    id="update_vtb_list",
-)
+async def search_uid_by_name(name: str) -> Optional[int]:
+    url = "https://api.bilibili.com/x/web-interface/wbi/search/type"
+    params = {"search_type": "bili_user", "keyword": name}
+    resp = await limited(
+        "search",
+        lambda cred: bilireq.utils.get(url, params=params, cookies=cred.cookies),
+    )
+    for user in resp.get("result") or []:
+        if user["uname"] == name:
+            return user["mid"]
 
 
-def load_vtb_list() -> List[dict]:
-    if vtb_list_path.exists():
-        with vtb_list_path.open("r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.decoder.JSONDecodeError:
-                logger.warning("vtb列表解析错误，将重新获取")
-                vtb_list_path.unlink()
-    return []
-
-
-def dump_vtb_list(vtb_list: List[dict]):
-    data_path.mkdir(parents=True, exist_ok=True)
-    json.dump(
-        vtb_list,
-        vtb_list_path.open("w", encoding="utf-8"),
-        indent=4,
-        separators=(",", ": "),
-        ensure_ascii=False,
+async def get_uid_by_name(name: str) -> Optional[int]:
+    # 别名在命令处理时已换成 uid；先查 vtb 列表和之前的搜索结果，最后才调用搜索接口
+    if uid := (await get_vtb_registry()).find_name(name):
+        return uid
+    if (uid := name_cache.get(name)) is not MISSING:
+        return uid
+    uid = await search_uid_by_name(name)
+    ttl = (
+        ddcheck_config.ddcheck_name_ttl
+        if uid
+        else ddcheck_config.ddcheck_name_negative_ttl
     )
+    name_cache.set(name, uid, ttl)
+    return uid
 
 
-async def get_vtb_list() -> List[dict]:
-    vtb_list = load_vtb_list()
-    if not vtb_list:
-        await update_vtb_list()
-    return load_vtb_list()
+async def get_json(url: str, params: dict, cred: Credential) -> dict:
+    resp = await get_client(url).get(url, params=params, headers=cred.headers)
+    resp.raise_for_status()
+    result = resp.json()
+    check_risk(result)
+    return result
 
 
-async def get_uid_by_name(name: str) -> Optional[int]:
-    url = "https://api.bilibili.com/x/web-interface/wbi/search/type"
-    params = {"search_type": "bili_user", "keyword": name}
-    resp = await bilireq.utils.get(url, params=params, cookies=cookies)
-    for user in resp["result"]:
-        if user["uname"] == name:
-            return user["mid"]
+async def get_medals(uid: int) -> List[dict]:
+    return await medal_cache.get(uid, lambda: fetch_medals(uid))
 
 
-async def get_medals(uid: int) -> List[dict]:
+async def fetch_medals(uid: int) -> List[dict]:
     url = "https://api.live.bilibili.com/xlive/web-ucenter/user/MedalWall"
     params = {"target_id": uid}
-    resp = await bilireq.utils.get(url, params=params, cookies=cookies)
+    resp = await limited(
+        "medal",
+        lambda cred: bilireq.utils.get(url, params=params, cookies=cred.cookies),
+    )
     return resp["list"]
 
 
 async def get_user_info(uid: int) -> dict:
+    return await user_card_cache.get(uid, lambda: fetch_user_info(uid))
+
+
+async def fetch_user_info(uid: int) -> dict:
     # cookies.update(await get_homepage_cookies())
     url = "https://api.bilibili.com/x/web-interface/card"
     params = {"mid": uid}
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Referer": "https://www.bilibili.com/",
-        "Accept": "application/json, text/plain, */*",
-    }
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url, params=params, cookies=cookies, headers=headers)
-        resp.raise_for_status()
-        result = resp.json()
-        try:
-            return result["data"]["card"]
-        except Exception:
-            logger.warning(
-                f"Get {uid} user info failed: {json.dumps(result, ensure_ascii=False, indent=2)}"
-            )
-            raise
+    result = await limited("card", lambda cred: get_json(url, params, cred))
+    try:
+        return result["data"]["card"]
+    except Exception:
+        logger.warning(
+            f"Get {uid} user info failed: {json.dumps(result, ensure_ascii=False, indent=2)}"
+        )
+        raise
 
 
-async def get_user_follows(uid: int) -> List[int]:
-    # cookies.update(await get_homepage_cookies())
-    url = "https://api.bilibili.com/x/relation/followings"
+FOLLOW_PAGE_SIZE = 50  # x/relation/followings 允许的最大 ps
+FOLLOW_INCREMENTAL_PAGES = 5  # 增量刷新最多向后翻的页数
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Referer": "https://www.bilibili.com/",
-        "Accept": "application/json, text/plain, */*",
-    }
+_follow_flight = SingleFlight()
+_reply_flight = SingleFlight()
 
-    pn = 1
-    total = -1
-    count = 0
-    follows = []
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        while count < total or total < 0:
-            params = {"vmid": uid, "pn": pn, "ps": 24}
-            resp = await client.get(
-                url, params=params, cookies=cookies, headers=headers
-            )
-            resp.raise_for_status()
-            result = resp.json()
-            # print(json.dumps(result, ensure_ascii=False, indent=2))
+async def get_follow_page(
+    uid: int, pn: int, cred: Credential
+) -> Tuple[List[int], int]:
+    url = "https://api.bilibili.com/x/relation/followings"
+    params = {"vmid": uid, "pn": pn, "ps": FOLLOW_PAGE_SIZE, "order": "desc"}
+    result = await limited(
+        "relation", lambda cred: get_json(url, params, cred), cred
+    )
+    try:
+        data = result["data"]
+        return [info["mid"] for info in data["list"]], data["total"]
+    except Exception:
+        logger.warning(
+            f"Get {uid} user follows page {pn} failed: {json.dumps(result, ensure_ascii=False, indent=2)}"
+        )
+        raise
 
-            try:
-                if total < 0:
-                    total = result["data"]["total"]  # 获取总关注数
 
-                follow_list = result["data"]["list"]
-                if not follow_list:  # 关注列表为空，说明爬取结束
-                    break
+async def crawl_user_follows(
+    uid: int, first: List[int], total: int, cred: Credential
+) -> List[int]:
+    # 已有第一页和总关注数，并发拉取剩余页
+    if not first or len(first) >= total:
+        return first
 
-                follows.extend([info["mid"] for info in follow_list])
-                count += len(follow_list)  # 更新已获取数量
-                pn += 1  # 增加页数
+    pages = math.ceil(total / FOLLOW_PAGE_SIZE)
+    sem = asyncio.Semaphore(max(ddcheck_config.ddcheck_follow_concurrency, 1))
 
-            except Exception:
-                logger.warning(
-                    f"Get {uid} user follows failed: {json.dumps(result, ensure_ascii=False, indent=2)}"
-                )
-                raise
+    async def fetch(pn: int) -> List[int]:
+        async with sem:
+            follows, _ = await get_follow_page(uid, pn, cred)
+            return follows
 
+    # TaskGroup 在任一页出错时取消其余请求
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(fetch(pn)) for pn in range(2, pages + 1)]
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+
+    follows = list(first)
+    for task in tasks:
+        page = task.result()
+        if not page:  # 关注列表为空，说明爬取结束
+            break
+        follows.extend(page)
     return follows
 
 
+async def merge_user_follows(
+    uid: int, first: List[int], total: int, cached: List[int], cred: Credential
+) -> Optional[List[int]]:
+    # 从最新的关注开始翻页，直到遇到缓存中的第一个
+    head = cached[0]
+    prefix: List[int] = []
+    page, pn = first, 1
+    while head not in page:
+        prefix.extend(page)
+        if len(page) < FOLLOW_PAGE_SIZE or pn >= FOLLOW_INCREMENTAL_PAGES:
+            return None
+        pn += 1
+        page, _ = await get_follow_page(uid, pn, cred)
+    follows = prefix + page[: page.index(head)] + cached
+    # 数量对不上说明中间有取关，需要全量重爬
+    return follows if len(follows) == total else None
+
+
+async def refresh_user_follows(uid: int) -> List[int]:
+    # cookies.update(await get_homepage_cookies())
+    entry = follow_cache.get(uid)
+    # 同一次翻页固定使用一个账号
+    cred = credential_pool.acquire()
+    first, total = await get_follow_page(uid, 1, cred)
+    follows = None
+    if entry and entry["follows"]:
+        follows = await merge_user_follows(uid, first, total, entry["follows"], cred)
+    if follows is None:
+        follows = await crawl_user_follows(uid, first, total, cred)
+    follow_cache.set(uid, follows, total)
+    return follows
+
+
+async def get_user_follows(uid: int) -> List[int]:
+    entry = follow_cache.get(uid)
+    if entry:
+        age = follow_cache.age(entry)
+        if age < ddcheck_config.ddcheck_follow_ttl:
+            return entry["follows"]
+        if age < ddcheck_config.ddcheck_follow_stale:
+            # 过期但仍可用：先返回缓存，后台刷新
+            if not _follow_flight.running(uid):
+                run_background(
+                    _follow_flight.do(uid, lambda: refresh_user_follows(uid))
+                )
+            return entry["follows"]
+    return await _follow_flight.do(uid, lambda: refresh_user_follows(uid))
+
+
 def format_color(color: int) -> str:
     return f"#{color:06X}"
 
@@ -190,8 +206,8 @@ def format_vtb_info(info: dict, medal_dict: dict) -> dict:
     name = info["uname"]
     uid = info["mid"]
     medal = {}
-    if name in medal_dict:
-        medal_info = medal_dict[name]["medal_info"]
+    if uid in medal_dict:
+        medal_info = medal_dict[uid]["medal_info"]
         medal = {
             "name": medal_info["medal_name"],
             "level": medal_info["level"],
@@ -202,7 +218,7 @@ def format_vtb_info(info: dict, medal_dict: dict) -> dict:
     return {"name": name, "uid": uid, "medal": medal}
 
 
-async def get_reply(name: str) -> Union[str, bytes]:
+async def get_reply(name: str) -> Union[str, bytes, List[bytes]]:
     if name.isdigit():
         uid = int(name)
     else:
@@ -213,12 +229,27 @@ async def get_reply(name: str) -> Union[str, bytes]:
             logger.warning(traceback.format_exc())
             return "获取用户信息失败，请检查名称或使用uid查询"
 
+    # 同一目标的并发查询共用一次计算和渲染
+    return await _reply_flight.do(uid, lambda: get_reply_by_uid(uid))
+
+
+async def get_reply_by_uid(uid: int) -> Union[str, bytes, List[bytes]]:
     try:
         user_info = await get_user_info(uid)
     except Exception:
         logger.warning(traceback.format_exc())
         return "获取用户信息失败，请检查名称或稍后再试"
+    # 头像与后续请求并发下载；渲染结果命中缓存时用不到，届时取消
+    face = asyncio.ensure_future(inline_image(user_info["face"]))
+    try:
+        return await build_reply(uid, user_info, face)
+    finally:
+        face.cancel()
+
 
+async def build_reply(
+    uid: int, user_info: dict, face: asyncio.Future
+) -> Union[str, bytes, List[bytes]]:
     attentions = await get_user_follows(uid)
     # attentions = user_info.get("attentions", [])
     # follows_num = int(user_info["attention"])
@@ -226,8 +257,8 @@ async def get_reply(name: str) -> Union[str, bytes]:
     if not attentions and follows_num:
         return "获取用户关注列表失败，关注列表可能未公开"
 
-    vtb_list = await get_vtb_list()
-    if not vtb_list:
+    vtb_registry = await get_vtb_registry()
+    if not vtb_registry:
         return "获取vtb列表失败，请稍后再试"
 
     try:
@@ -235,15 +266,14 @@ async def get_reply(name: str) -> Union[str, bytes]:
     except Exception:
         logger.warning(traceback.format_exc())
         medals = []
-    medal_dict = {medal["target_name"]: medal for medal in medals}
+    # 按主播 uid 关联粉丝牌，主播改名也能对上
+    medal_dict = {medal["medal_info"]["target_id"]: medal for medal in medals}
 
-    vtb_dict = {info["mid"]: info for info in vtb_list}
-    vtbs = [info for uid, info in vtb_dict.items() if uid in attentions]
+    vtbs = vtb_registry.intersect(dict.fromkeys(attentions))
     vtbs = [format_vtb_info(info, medal_dict) for info in vtbs]
 
     vtbs_num = len(vtbs)
     percent = vtbs_num / follows_num * 100 if follows_num else 0
-    num_per_col = math.ceil(vtbs_num / math.ceil(vtbs_num / 100)) if vtbs_num else 1
     result = {
         "name": user_info["name"],
         "uid": user_info["mid"],
@@ -251,12 +281,37 @@ async def get_reply(name: str) -> Union[str, bytes]:
         "fans": user_info["fans"],
         "follows": follows_num,
         "percent": f"vtb-{percent:.2f}%({vtbs_num})",
-        "vtbs": vtbs,
-        "num_per_col": num_per_col,
     }
-    template = env.get_template("info.html")
-    content = await template.render_async(info=result)
-    return await html_to_pic(content, wait=0, viewport={"width": 100, "height": 100})
+
+    tile_size = ddcheck_config.ddcheck_tile_size
+    if tile_size <= 0 or vtbs_num <= tile_size:
+        return await render_info(
+            {**result, "vtbs": vtbs, "num_per_col": get_num_per_col(vtbs_num)},
+            face=face,
+        )
+
+    # 结果过多时分块渲染，每块一张图，并发数受页面池限制
+    tiles = [vtbs[i : i + tile_size] for i in range(0, vtbs_num, tile_size)]
+    return list(
+        await asyncio.gather(
+            *(
+                render_info(
+                    {
+                        **result,
+                        "vtbs": tile,
+                        "num_per_col": get_num_per_col(len(tile)),
+                        "page": f"{i + 1}/{len(tiles)}",
+                    },
+                    face=face,
+                )
+                for i, tile in enumerate(tiles)
+            )
+        )
+    )
+
+
+def get_num_per_col(vtbs_num: int) -> int:
+    return math.ceil(vtbs_num / math.ceil(vtbs_num / 100)) if vtbs_num else 1
 
 
 def load_json(file: Path, default=[]):
@@ -1,43 +1,279 @@
 import asyncio
 import datetime
+import heapq
+import itertools
 import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import yt_dlp
 from bilibili_api import user
+from nonebot import get_driver
 from nonebot.adapters.onebot.v11 import MessageSegment
 from nonebot.log import logger
-from retry import retry
 
-timers = {}
-timer_info = {}
+from .client import get_client
+from .config import ddcheck_config
+from .live_push import LivePushManager
+from .notify import NotifyScheduler
+from .ratelimit import check_risk, limited
+from .utils import run_background
 
+# yt_dlp 是同步的，放到线程池里跑，避免阻塞事件循环
+ytdlp_executor = ThreadPoolExecutor(
+    max_workers=max(ddcheck_config.ddcheck_ytdlp_workers, 1),
+    thread_name_prefix="ddcheck-ytdlp",
+)
 
-# 获取B站直播预约信息
-@retry(tries=3, delay=2)
-async def get_upcoming_bili_live(uid):
-    logger.info(f"Fetching upcoming live for UID: {uid}")
+driver = get_driver()
+
+
+@driver.on_shutdown
+async def _():
+    # 不等待仍在运行的提取，未开始的直接取消
+    ytdlp_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract_info(url, ydl_opts, timeout=None):
+    timeout = timeout or ddcheck_config.ddcheck_ytdlp_timeout
+    # 线程无法强行中断，靠 socket_timeout 让超时的提取尽快结束
+    ydl_opts = {"socket_timeout": min(timeout, 30), **ydl_opts}
+
+    def run():
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(ytdlp_executor, run), timeout)
+
+
+BILI_STATUS_URL = "https://api.live.bilibili.com/room/v1/Room/get_status_info_by_uids"
+BILI_STATUS_BATCH = 100
+BILI_RESERVATION_TTL = 6 * 3600
+
+bili_status = {}  # uid -> 上次看到的 live_status
+bili_reservations = {}  # uid -> (过期时间, 最近的直播预约)
+_last_bili_poll = 0.0
+
+
+async def get_bili_live_status(uids):
+    """批量查询直播间状态，每批一个请求"""
+    statuses = {}
+    for i in range(0, len(uids), BILI_STATUS_BATCH):
+        chunk = [int(uid) for uid in uids[i : i + BILI_STATUS_BATCH]]
+
+        async def post(cred, chunk=chunk):
+            resp = await get_client(BILI_STATUS_URL).post(
+                BILI_STATUS_URL, json={"uids": chunk}, headers=cred.headers
+            )
+            resp.raise_for_status()
+            result = resp.json()
+            check_risk(result)
+            return result
+
+        result = await limited("live", post)
+        if result.get("code") != 0:
+            raise ValueError(f"Get live status failed: {result}")
+        for uid, info in (result.get("data") or {}).items():
+            statuses[str(uid)] = info
+    return statuses
+
+
+async def get_bili_reservation(uid, force=False):
+    cached = bili_reservations.get(uid)
+    if cached and not force:
+        expires_at, reservation = cached
+        now = time.time()
+        if now < expires_at and (
+            not reservation or reservation["live_plan_start_time"] > now
+        ):
+            return reservation
+    data = await limited("live", lambda _: user.User(int(uid)).get_reservation())
+    now = time.time()
+    upcoming = [r for r in data or [] if r.get("live_plan_start_time", 0) > now]
+    reservation = (
+        min(upcoming, key=lambda r: r["live_plan_start_time"]) if upcoming else None
+    )
+    # 当天才发布的预约很常见，没有预约的结果缓存得短一些；
+    # 过期时间加随机抖动，每轮只有一小部分主播需要重新查询
+    ttl = (
+        BILI_RESERVATION_TTL
+        if reservation
+        else ddcheck_config.ddcheck_schedule_max_age
+    )
+    bili_reservations[uid] = (now + ttl * random.uniform(1, 1.5), reservation)
+    return reservation
+
+
+async def update_bili_timers(bot, vtb_data, bind_data, partial=False):
+    """一次批量请求拿到所有主播的直播状态，只对状态变化的主播重新查询预约"""
+    global _last_bili_poll
+    if not partial:
+        _last_bili_poll = time.time()
+    if not vtb_data:
+        return {}
+    uids = [str(vtb["uid"]) for vtb in vtb_data]
     try:
-        u = user.User(uid)
-        data = await u.get_reservation()
-    except Exception as e:
-        logger.error(f"Error fetching live info for UID: {uid} - {e}")
+        statuses = await get_bili_live_status(uids)
+    except Exception:
+        for uid in uids:
+            mark_bili_checked(uid)
         raise
+    sem = asyncio.Semaphore(max(ddcheck_config.ddcheck_poll_concurrency, 1))
+    results = {}
+
+    async def check(vtb):
+        uid = str(vtb["uid"])
+        info = statuses.get(uid) or {}
+        status = info.get("live_status")
+        changed = bili_status.get(uid, -1) != status
+        bili_status[uid] = status
+        try:
+            async with sem:
+                reservation = await get_bili_reservation(uid, force=changed)
+        except Exception as e:
+            logger.error(f"Get reservation of {vtb['nickname']} failed: {e!r}")
+            mark_bili_checked(uid)
+            results[uid] = e
+            return
+
+        live_info = None
+        if reservation:
+            url = (
+                f"https://live.bilibili.com/{info['room_id']}"
+                if info.get("room_id")
+                else f"https://space.bilibili.com/{uid}"
+            )
+            live_info = {
+                "url": url,
+                "release_time": reservation["live_plan_start_time"],
+                "title": reservation.get("name") or info.get("title") or "",
+            }
+            # 推送模式下由直播间的开播事件提醒，预约只用于查询日程
+            if not live_push.active:
+                await add_timer(
+                    vtb["nickname"],
+                    uid,
+                    live_info["release_time"],
+                    vtb["sub_group"],
+                    url,
+                    bot,
+                    bind_data,
+                    live_info["title"],
+                )
+        live_schedule[uid] = {"live_info": live_info, "checked_at": time.time()}
+        results[uid] = live_info
 
-    if data:
-        space_info = await u.get_live_info()
-        live_room_url = space_info["live_room"]["url"]
-        dt_object = data[0]["live_plan_start_time"]
-        return {
-            "url": live_room_url,
-            "release_time": dt_object,
+    await asyncio.gather(*(check(vtb) for vtb in vtb_data))
+    return results
+
+
+def mark_bili_checked(uid):
+    # 失败时保留上次的结果，只更新检查时间，避免每次查询日程都当场重试
+    live_schedule.setdefault(uid, {"live_info": None})["checked_at"] = time.time()
+
+
+def refresh_bili_background(bot, vtb_data, bind_data):
+    if "bili" in _refreshing:
+        return
+    _refreshing.add("bili")
+    task = run_background(update_bili_timers(bot, vtb_data, bind_data))
+    task.add_done_callback(lambda _: _refreshing.discard("bili"))
+
+
+async def update_bili_timer(bot, vtb, bind_data):
+    """只刷新一个主播，例如新增关注时"""
+    results = await update_bili_timers(bot, [vtb], bind_data, partial=True)
+    live_info = results.get(str(vtb["uid"]))
+    if isinstance(live_info, Exception):
+        raise live_info
+    return live_info
+
+
+async def get_bili_schedule(bot, vtb_data, bind_data):
+    """B站主播的日程；批量刷新很便宜，缺失时当场刷新，过旧时后台刷新"""
+    uids = [str(vtb["uid"]) for vtb in vtb_data]
+    if any(uid not in live_schedule for uid in uids):
+        try:
+            await update_bili_timers(bot, vtb_data, bind_data)
+        except Exception as e:
+            logger.error(f"Update bilibili live info failed: {e!r}")
+    elif time.time() - _last_bili_poll > ddcheck_config.ddcheck_schedule_max_age:
+        refresh_bili_background(bot, vtb_data, bind_data)
+    return [
+        (vtb, live_schedule.get(str(vtb["uid"]), {}).get("live_info"))
+        for vtb in vtb_data
+    ]
+
+
+YTB_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.youtube.com/",
+    "Cookie": "SOCS=CAI",  # 跳过欧盟地区的 cookie 同意页
+}
+
+
+def iter_video_renderers(data):
+    # 页面结构经常调整，直接按顺序遍历所有 videoRenderer
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "videoRenderer" in node:
+                yield node["videoRenderer"]
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def parse_upcoming_streams(html, limit=5):
+    """从频道 /streams 页面内嵌的 ytInitialData 中解析最近的直播预约"""
+    start = html.find("ytInitialData")
+    start = html.find("{", start) if start >= 0 else -1
+    if start < 0:
+        raise ValueError("ytInitialData not found")
+    data, _ = json.JSONDecoder().raw_decode(html, start)
+
+    videos = list(itertools.islice(iter_video_renderers(data), limit))
+    if not videos:
+        raise ValueError("no videos in ytInitialData")
+
+    up_coming = None
+    for video in videos:
+        start_time = video.get("upcomingEventData", {}).get("startTime")
+        if start_time is None:
+            break
+        title = "".join(run["text"] for run in video["title"].get("runs", []))
+        if "schedule" in title.lower():
+            continue
+        up_coming = {
+            "url": f"https://www.youtube.com/watch?v={video['videoId']}",
+            "release_time": int(start_time),
+            "title": title,
         }
-    else:
-        logger.info(f"No upcoming live found for UID: {uid}")
-        return None
+    return up_coming
+
+
+async def fetch_youtube_upcoming(ytber):
+    url = f"https://www.youtube.com/{ytber}/streams"
+    resp = await get_client(url).get(url, headers=YTB_HEADERS, timeout=20)
+    resp.raise_for_status()
+    return parse_upcoming_streams(resp.text)
 
 
 # 获取YouTube直播预约信息
 async def get_upcoming_youtube_live(ytber):
+    try:
+        return await fetch_youtube_upcoming(ytber)
+    except Exception as e:
+        logger.warning(f"Fast path failed for {ytber}, fallback to yt_dlp: {e!r}")
+    return await get_upcoming_youtube_live_ytdlp(ytber)
+
+
+async def get_upcoming_youtube_live_ytdlp(ytber):
     channel_url = f"https://www.youtube.com/{ytber}/streams"
     ydl_opts = {
         "flat_playlist": True,
@@ -47,8 +283,7 @@ async def get_upcoming_youtube_live(ytber):
         "format": "json",
         "quiet": True,
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(channel_url, download=False)
+    result = await extract_info(channel_url, ydl_opts)
 
     up_coming = None
     for entry in result["entries"]:
@@ -62,104 +297,324 @@ async def get_upcoming_youtube_live(ytber):
     return up_coming
 
 
-async def timer_task(
-    nickname, delay, url, sub_groups, bot, bind_data, uid_or_id, title=None
-):
-    await asyncio.sleep(delay)
-    for group_id in sub_groups:
+async def timer_task(entry):
+    bot, bind_data = notify_context["bot"], notify_context["bind_data"]
+    for group_id in entry["sub_groups"]:
         message = ""
         for bind in bind_data:
             if bind["group_id"] == str(group_id):
                 message += MessageSegment.at(bind["target_qq"]) + " "
         await bot.send_group_msg(
             group_id=group_id,
-            message=message + f"{nickname}开播啦！gkd\n\n{title}\n{url}",
+            message=message
+            + f"{entry['nickname']}开播啦！gkd\n\n{entry['title']}\n{entry['url']}",
         )
-    timers.pop(uid_or_id, None)
+
+
+# 所有开播提醒由同一个调度任务负责，发送时再取最新的 bot 与绑定关系
+notify_context = {"bot": None, "bind_data": []}
+notify_scheduler = NotifyScheduler(timer_task)
+timers = notify_scheduler.entries
+
+
+def start_notifier(bot, bind_data, path):
+    notify_context["bot"] = bot
+    notify_context["bind_data"] = bind_data
+    if notify_scheduler.path is None:
+        notify_scheduler.load(path)
+        return True
+    return False
 
 
 async def add_timer(
     nickname, uid_or_id, release_time, sub_groups, url, bot, bind_data, title=None
 ):
-    if uid_or_id in timers:
+    notify_context["bot"] = bot
+    notify_context["bind_data"] = bind_data
+    entry = notify_scheduler.get(uid_or_id)
+    if entry and abs(entry["release_time"] - release_time) <= 60:  # 允许1分钟的误差
+        if entry["sub_groups"] != list(sub_groups):
+            notify_scheduler.update_groups(uid_or_id, sub_groups)
         return
+    notify_scheduler.schedule(uid_or_id, nickname, release_time, url, sub_groups, title)
 
-    delay = release_time - datetime.datetime.now().timestamp()
-    if delay <= 0:
-        return
 
-    task = asyncio.create_task(
-        timer_task(nickname, delay, url, sub_groups, bot, bind_data, uid_or_id, title)
+# 后台轮询维护的直播日程：频道 id -> 最近一次的直播信息与检查时间
+live_schedule = {}
+_refreshing = set()
+
+
+async def get_live_schedule(bot, ytb_data, bind_data):
+    """从日程缓存中读取；从未检查过的频道当场轮询，过旧的在后台刷新"""
+    now = time.time()
+    max_age = ddcheck_config.ddcheck_schedule_max_age
+    missing = [ytb for ytb in ytb_data if ytb["id"] not in live_schedule]
+    stale = [
+        ytb
+        for ytb in ytb_data
+        if ytb["id"] in live_schedule
+        and ytb["id"] not in _refreshing
+        and now - live_schedule[ytb["id"]]["checked_at"] > max_age
+    ]
+    poll_scheduler.charge(len(missing) + len(stale))
+    if missing:
+        results = await poll_channels(bot, missing, bind_data)
+        for ytb in missing:
+            poll_scheduler.polled(ytb["id"], results.get(ytb["id"]))
+    if stale:
+        _refreshing.update(ytb["id"] for ytb in stale)
+        task = run_background(poll_channels(bot, stale, bind_data))
+        task.add_done_callback(
+            lambda _: _refreshing.difference_update(ytb["id"] for ytb in stale)
+        )
+    return [
+        (ytb, live_schedule.get(ytb["id"], {}).get("live_info")) for ytb in ytb_data
+    ]
+
+
+POLL_MIN_INTERVAL = 120  # 临近开播时的轮询间隔
+POLL_DEFAULT_INTERVAL = 1800
+POLL_MAX_INTERVAL = 6 * 3600
+
+
+def next_poll_delay(live_info, idle_count):
+    """根据已知的开播时间决定下次轮询的间隔：越临近越密集，长期无预约则逐步退避"""
+    if isinstance(live_info, Exception):
+        return POLL_DEFAULT_INTERVAL
+    if not live_info:
+        return min(POLL_DEFAULT_INTERVAL * 2**idle_count, POLL_MAX_INTERVAL)
+    remaining = live_info["release_time"] - datetime.datetime.now().timestamp()
+    if remaining <= 0:  # 已经开播
+        return POLL_DEFAULT_INTERVAL
+    if remaining <= 900:
+        return POLL_MIN_INTERVAL
+    return min(max(remaining / 4, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
+
+
+class PollScheduler:
+    """按频道各自的下次轮询时间排成最小堆，同时受全局请求预算约束"""
+
+    def __init__(self, budget_per_hour, burst=0):
+        self.heap = []
+        self.scheduled = set()
+        self.idle = {}
+        self.rate = max(budget_per_hour, 1) / 3600
+        # burst 为 0 时桶容量跟随频道数，启动时所有频道都能立即轮询一次
+        self.burst = burst
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def push(self, ytb_id, due):
+        heapq.heappush(self.heap, (due, ytb_id))
+        self.scheduled.add(ytb_id)
+
+    def sync(self, ytb_data):
+        now = time.time()
+        for ytb in ytb_data:
+            if ytb["id"] not in self.scheduled:
+                self.push(ytb["id"], now)
+        if not self.burst and len(ytb_data) > self.capacity:
+            # 新增的频道带着自己的首轮令牌加入
+            self.refill()
+            self.tokens += len(ytb_data) - self.capacity
+            self.capacity = len(ytb_data)
+
+    def charge(self, count=1):
+        """计入调度之外的轮询（新增关注、查询日程），令牌可以暂时为负"""
+        self.refill()
+        self.tokens -= count
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pop_due(self, ytb_data):
+        """取出已到期且在预算内的频道；返回 (频道列表, 建议等待秒数)"""
+        self.refill()
+        channels = {ytb["id"]: ytb for ytb in ytb_data}
+        due = []
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now and len(due) < int(self.tokens):
+            _, ytb_id = heapq.heappop(self.heap)
+            self.scheduled.discard(ytb_id)
+            if ytb_id in channels:  # 已取消关注的频道直接丢弃
+                due.append(channels[ytb_id])
+        self.tokens -= len(due)
+        if due:
+            return due, 0
+        if self.heap and self.heap[0][0] <= now:
+            return due, (1 - self.tokens) / self.rate  # 预算用完，等待令牌
+        if self.heap:
+            return due, self.heap[0][0] - now
+        return due, 60
+
+    def polled(self, ytb_id, live_info):
+        """调度之外已经轮询过一次（如新增关注），按正常间隔安排下次轮询"""
+        if ytb_id not in self.scheduled:
+            self.reschedule(ytb_id, live_info)
+
+    def reschedule(self, ytb_id, live_info):
+        if not live_info or isinstance(live_info, Exception):
+            self.idle[ytb_id] = self.idle.get(ytb_id, -1) + 1
+        else:
+            self.idle[ytb_id] = 0
+        delay = next_poll_delay(live_info, self.idle[ytb_id])
+        self.push(ytb_id, time.time() + delay)
+
+
+bili_room_ids = {}  # uid -> room_id，没有直播间时为 None
+bili_titles = {}  # uid -> 直播间标题
+bili_rooms = {}  # room_id -> 关注项，关注同一直播间的群共用一条连接
+# uid -> 当前这场直播是否已经提醒过；只由推送事件维护，与轮询的 bili_status 无关
+pushed_live = {}
+
+
+async def handle_live_event(room_id, message):
+    vtb = bili_rooms.get(room_id)
+    if not vtb:
+        return
+    uid = str(vtb["uid"])
+    if message["cmd"] == "PREPARING":
+        pushed_live[uid] = False
+        return
+    # 同一次开播会推送多条 LIVE，只提醒第一条
+    if pushed_live.get(uid):
+        return
+    pushed_live[uid] = True
+    try:
+        # 标题常在开播前修改，提醒时取最新的
+        if info := (await get_bili_live_status([uid])).get(uid):
+            bili_titles[uid] = info.get("title", "")
+    except Exception as e:
+        logger.warning(f"Refresh live title of {vtb['nickname']} failed: {e!r}")
+    await timer_task(
+        {
+            "key": uid,
+            "nickname": vtb["nickname"],
+            "release_time": time.time(),
+            "url": f"https://live.bilibili.com/{room_id}",
+            "sub_groups": vtb["sub_group"],
+            "title": bili_titles.get(uid, ""),
+        }
     )
-    timers[uid_or_id] = task
-    timer_info[uid_or_id] = {"release_time": release_time}  # 存储额外信息
+
+
+live_push = LivePushManager(handle_live_event)
+driver.on_shutdown(live_push.close)
+
+
+async def sync_live_push(vtb_data):
+    """为每个关注的B站主播保持一条直播间连接，只为新增主播查询房间号"""
+    new_uids = [
+        str(vtb["uid"]) for vtb in vtb_data if str(vtb["uid"]) not in bili_room_ids
+    ]
+    if new_uids:
+        statuses = await get_bili_live_status(new_uids)
+        for uid in new_uids:
+            info = statuses.get(uid) or {}
+            bili_room_ids[uid] = info.get("room_id")
+            # 启动时已在直播的，不再为这一场提醒
+            pushed_live[uid] = info.get("live_status") == 1
+            bili_titles[uid] = info.get("title", "")
+    rooms = {}
+    for vtb in vtb_data:
+        if room_id := bili_room_ids.get(str(vtb["uid"])):
+            rooms[room_id] = vtb
+    bili_rooms.clear()
+    bili_rooms.update(rooms)
+    live_push.sync(rooms)
+
+
+poll_scheduler = PollScheduler(
+    ddcheck_config.ddcheck_poll_budget, ddcheck_config.ddcheck_poll_burst
+)
 
 
 async def check_timers(bot, vtb_data, ytb_data, bind_data):
+    scheduler = poll_scheduler
+    push = ddcheck_config.ddcheck_live_push
+    if push and not live_push.supported():
+        logger.warning("ddcheck_live_push 需要支持 websocket 客户端的驱动器，回退到轮询")
+        push = False
+    notify_context["bot"] = bot
+    notify_context["bind_data"] = bind_data
+    if push:
+        live_push.active = True
+        # 之前按预约时间排好的B站提醒由推送事件取代
+        for vtb in vtb_data:
+            notify_scheduler.cancel(vtb["uid"])
     while True:
-        try:
-            await update_timers(bot, vtb_data, ytb_data, bind_data)
-        except TimeoutError:
-            logger.error("TimeoutError: Failed to update timers. Retrying...")
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-        await asyncio.sleep(1800)  # 每半小时检查一次
-
-
-async def update_timers(bot, vtb_data, ytb_data, bind_data):
-    # for vtb in vtb_data:
-    #     logger.info("update bilibili live info")
-    #     live_info = await get_upcoming_bili_live(vtb["uid"])
-
-    #     if live_info:
-    #         release_time = live_info["release_time"]
-    #         logger.info(f"{vtb['nickname']}, {get_formatted_time_left(release_time)}")
-    #         if vtb["uid"] not in timers:
-    #             await add_timer(
-    #                 vtb["nickname"],
-    #                 vtb["uid"],
-    #                 release_time,
-    #                 vtb["sub_group"],
-    #                 live_info["url"],
-    #                 bot,
-    #                 bind_data,
-    #             )
-
-    for ytb in ytb_data:
-        logger.info("update youtube live info")
-        live_info = await get_upcoming_youtube_live(ytb["id"])
-
-        if live_info:
-            release_time = live_info["release_time"]
-            logger.info(f"{ytb['nickname']}, {get_formatted_time_left(release_time)}")
-            if ytb["id"] not in timers:
-                await add_timer(
-                    ytb["nickname"],
-                    ytb["id"],
-                    release_time,
-                    ytb["sub_group"],
-                    live_info["url"],
-                    bot,
-                    bind_data,
-                    live_info["title"],
+        if push:
+            try:
+                await sync_live_push(vtb_data)
+            except Exception as e:
+                logger.error(f"Sync bilibili live rooms failed: {e!r}")
+        elif time.time() - _last_bili_poll >= ddcheck_config.ddcheck_bili_poll_interval:
+            # 预约查询排在限速器后面，放到后台，不耽误 YouTube 的轮询调度
+            refresh_bili_background(bot, vtb_data, bind_data)
+        scheduler.sync(ytb_data)
+        due, wait = scheduler.pop_due(ytb_data)
+        if not due:
+            # 最多睡一分钟，以便及时发现新关注的频道和B站轮询
+            await asyncio.sleep(min(max(wait, 1), 60))
+            continue
+        results = await poll_channels(bot, due, bind_data)
+        for ytb in due:
+            scheduler.reschedule(ytb["id"], results.get(ytb["id"]))
+        logger.info(f"count timers: {len(timers)}")
+
+
+async def poll_channels(bot, ytbs, bind_data):
+    """并发轮询频道，返回 id -> 直播信息（失败时为异常对象）"""
+    # 单个频道超时或出错不影响其他频道
+    sem = asyncio.Semaphore(max(ddcheck_config.ddcheck_poll_concurrency, 1))
+    results = {}
+
+    async def poll(ytb):
+        async with sem:
+            try:
+                results[ytb["id"]] = await asyncio.wait_for(
+                    update_ytb_timer(bot, ytb, bind_data),
+                    ddcheck_config.ddcheck_poll_timeout,
                 )
-            else:
-                stored_time = timer_info[ytb["id"]][
-                    "release_time"
-                ]  # 获取存储的 release_time
-                if abs(stored_time - release_time) > 60:  # 允许1分钟的误差
-                    timers[ytb["id"]].cancel()
-                    await add_timer(
-                        ytb["nickname"],
-                        ytb["id"],
-                        release_time,
-                        ytb["sub_group"],
-                        live_info["url"],
-                        bot,
-                        bind_data,
-                        live_info["title"],
-                    )
-    logger.info(f"count timers: {len(timers)}")
+            except asyncio.TimeoutError as e:
+                logger.warning(f"Update {ytb['nickname']} live info timeout")
+                results[ytb["id"]] = e
+            except Exception as e:
+                logger.error(f"Update {ytb['nickname']} live info failed: {e!r}")
+                results[ytb["id"]] = e
+
+    await asyncio.gather(*(poll(ytb) for ytb in ytbs))
+    for ytb_id, result in results.items():
+        if isinstance(result, Exception):
+            # 失败时保留上次的结果，只更新检查时间，避免反复重试
+            entry = live_schedule.setdefault(ytb_id, {"live_info": None})
+            entry["checked_at"] = time.time()
+    return results
+
+
+async def update_ytb_timer(bot, ytb, bind_data):
+    logger.info(f"update youtube live info: {ytb['nickname']}")
+    live_info = await get_upcoming_youtube_live(ytb["id"])
+    live_schedule[ytb["id"]] = {"live_info": live_info, "checked_at": time.time()}
+    if not live_info:
+        return live_info
+
+    release_time = live_info["release_time"]
+    logger.info(f"{ytb['nickname']}, {get_formatted_time_left(release_time)}")
+    await add_timer(
+        ytb["nickname"],
+        ytb["id"],
+        release_time,
+        ytb["sub_group"],
+        live_info["url"],
+        bot,
+        bind_data,
+        live_info["title"],
+    )
+    return live_info
 
 
 def get_formatted_time_left(release_time):
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import random
+import struct
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from nonebot import get_driver
+from nonebot.drivers import Request, WebSocketClientMixin
+from nonebot.log import logger
+
+from .client import get_client
+from .config import ddcheck_config
+from .credentials import credential_pool
+
+# B站直播弹幕协议（大端）:
+#   header: packet_len(I) header_len(H) protover(H) op(I) seq(I)
+#   protover 0/1 为明文，2 为 zlib 压缩的若干个完整包
+HEADER = struct.Struct(">IHHII")
+OP_HEARTBEAT = 2
+OP_HEARTBEAT_REPLY = 3
+OP_MESSAGE = 5
+OP_AUTH = 7
+OP_AUTH_REPLY = 8
+PROTOVER_ZLIB = 2
+
+DANMU_INFO_URL = "https://api.live.bilibili.com/xlive/web-room/v1/index/getDanmuInfo"
+DEFAULT_WS_URL = "wss://broadcastlv.chat.bilibili.com/sub"
+HEARTBEAT_INTERVAL = 30
+# 断线重连的退避区间，连接稳定超过 STABLE_AFTER 秒后重置
+BACKOFF_MIN = 1
+BACKOFF_MAX = 120
+STABLE_AFTER = 60
+LIVE_EVENTS = {"LIVE", "PREPARING"}
+
+
+def pack(op: int, body: bytes = b"", protover: int = 1) -> bytes:
+    return HEADER.pack(HEADER.size + len(body), HEADER.size, protover, op, 1) + body
+
+
+def unpack(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """拆出一帧里的所有包，压缩包递归展开"""
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        packet_len, header_len, protover, op, _ = HEADER.unpack_from(data, offset)
+        if packet_len < header_len:
+            break
+        body = data[offset + header_len : offset + packet_len]
+        offset += packet_len
+        if op == OP_MESSAGE and protover == PROTOVER_ZLIB:
+            yield from unpack(zlib.decompress(body))
+        else:
+            yield op, body
+
+
+async def get_danmu_auth(room_id: int) -> Tuple[str, str]:
+    """取弹幕服务器地址和 token，失败时匿名连接默认服务器
+
+    未做 WBI 签名的请求常被拒绝（-352），这是预期内的失败，
+    因此不经过限速器，也不把账号标记为触发风控。
+    """
+    if ddcheck_config.ddcheck_live_ws_url:
+        return ddcheck_config.ddcheck_live_ws_url, ""
+    try:
+        resp = await get_client(DANMU_INFO_URL).get(
+            DANMU_INFO_URL,
+            params={"id": room_id},
+            headers=credential_pool.acquire().headers,
+        )
+        resp.raise_for_status()
+        result = resp.json()
+        if result.get("code") != 0:
+            raise ValueError(f"code {result.get('code')}")
+        data = result["data"]
+        host = data["host_list"][0]
+        return f"wss://{host['host']}:{host['wss_port']}/sub", data["token"]
+    except Exception as e:
+        logger.debug(f"Get danmu info of room {room_id} failed: {e!r}")
+        return DEFAULT_WS_URL, ""
+
+
+class RoomConnection:
+    """一个直播间的长连接，关注同一直播间的所有群共用"""
+
+    def __init__(
+        self, room_id: int, on_event: Callable[[int, dict], Awaitable[None]]
+    ):
+        self.room_id = room_id
+        self.on_event = on_event
+        self.connected = False
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        backoff = BACKOFF_MIN
+        while True:
+            started = time.monotonic()
+            try:
+                await self.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live room {self.room_id} disconnected: {e!r}")
+            self.connected = False
+            if time.monotonic() - started > STABLE_AFTER:
+                backoff = BACKOFF_MIN
+            # 加随机抖动，避免大量直播间同时重连
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, BACKOFF_MAX)
+
+    async def connect(self):
+        url, token = await get_danmu_auth(self.room_id)
+        driver = get_driver()
+        request = Request("GET", url, timeout=HEARTBEAT_INTERVAL * 2)
+        async with driver.websocket(request) as ws:
+            auth = {
+                "uid": 0,
+                "roomid": self.room_id,
+                "protover": PROTOVER_ZLIB,
+                "platform": "web",
+                "type": 2,
+                "key": token,
+            }
+            await ws.send_bytes(pack(OP_AUTH, json.dumps(auth).encode()))
+            heartbeat = asyncio.create_task(self.heartbeat(ws))
+            try:
+                while True:
+                    await self.handle(await ws.receive_bytes())
+            finally:
+                heartbeat.cancel()
+
+    async def heartbeat(self, ws):
+        while True:
+            await ws.send_bytes(pack(OP_HEARTBEAT))
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def handle(self, data: bytes):
+        for op, body in unpack(data):
+            if op == OP_AUTH_REPLY:
+                self.connected = True
+                logger.debug(f"Live room {self.room_id} connected")
+            elif op == OP_MESSAGE:
+                try:
+                    message = json.loads(body)
+                except ValueError:
+                    continue
+                if message.get("cmd") not in LIVE_EVENTS:
+                    continue
+                # 提醒发送失败不应断开连接
+                try:
+                    await self.on_event(self.room_id, message)
+                except Exception as e:
+                    logger.error(
+                        f"Handle live event of room {self.room_id} failed: {e!r}"
+                    )
+
+
+class LivePushManager:
+    """按直播间维护长连接，关注列表变化时增删连接"""
+
+    def __init__(self, on_event: Callable[[int, dict], Awaitable[None]]):
+        self.on_event = on_event
+        self.rooms: Dict[int, RoomConnection] = {}
+        self.active = False
+
+    @staticmethod
+    def supported() -> bool:
+        return isinstance(get_driver(), WebSocketClientMixin)
+
+    def sync(self, room_ids):
+        room_ids = set(room_ids)
+        for room_id in self.rooms.keys() - room_ids:
+            self.rooms.pop(room_id).stop()
+        for room_id in room_ids - self.rooms.keys():
+            self.rooms[room_id] = conn = RoomConnection(room_id, self.on_event)
+            conn.start()
+
+    async def close(self):
+        # 在事件循环里取消，并等连接真正关闭
+        self.active = False
+        tasks = [conn.task for conn in self.rooms.values() if conn.task]
+        self.sync(())
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self.rooms)
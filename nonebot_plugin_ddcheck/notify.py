@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from nonebot.log import logger
+
+# 重启后仍补发的过期提醒的宽限时间
+MISSED_GRACE = 600
+# 最长睡眠时间，醒来后重新读取系统时间，应对时钟漂移和休眠
+MAX_SLEEP = 60
+SAVE_INTERVAL = 5
+
+
+class NotifyScheduler:
+    """单任务的开播提醒调度：按开播时间排成最小堆，持久化到磁盘
+
+    改期时直接压入新的堆项，旧项在弹出时按序号识别并丢弃（惰性删除），
+    因此新增、改期都是 O(log n)。
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]]):
+        self.send = send
+        self.entries: Dict[str, dict] = {}
+        self.heap: List[Tuple[float, int, str]] = []
+        self.path: Optional[Path] = None
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self.entries
+
+    def get(self, key) -> Optional[dict]:
+        return self.entries.get(str(key))
+
+    def schedule(
+        self,
+        key,
+        nickname: str,
+        release_time: float,
+        url: str,
+        sub_groups: List,
+        title: Optional[str] = None,
+    ) -> bool:
+        key = str(key)
+        if release_time <= time.time():
+            return False
+        seq = next(self._seq)
+        self.entries[key] = {
+            "key": key,
+            "nickname": nickname,
+            "release_time": release_time,
+            "url": url,
+            "sub_groups": list(sub_groups),
+            "title": title,
+            "seq": seq,
+        }
+        heapq.heappush(self.heap, (release_time, seq, key))
+        self._changed()
+        return True
+
+    def update_groups(self, key, sub_groups: List):
+        if entry := self.entries.get(str(key)):
+            entry["sub_groups"] = list(sub_groups)
+            self._changed()
+
+    def cancel(self, key):
+        if self.entries.pop(str(key), None):
+            self._changed()
+
+    def _changed(self):
+        self._dirty = True
+        self._wakeup.set()
+        # 过期堆项太多时重建，保持内存与条目数同阶
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [
+                (entry["release_time"], entry["seq"], key)
+                for key, entry in self.entries.items()
+            ]
+            heapq.heapify(self.heap)
+
+    def _is_current(self, item: Tuple[float, int, str]) -> bool:
+        entry = self.entries.get(item[2])
+        return entry is not None and entry["seq"] == item[1]
+
+    def pop_due(self, now: float) -> List[dict]:
+        due = []
+        while self.heap and (
+            not self._is_current(self.heap[0]) or self.heap[0][0] <= now
+        ):
+            item = heapq.heappop(self.heap)
+            if self._is_current(item):
+                due.append(self.entries.pop(item[2]))
+                self._dirty = True
+        return due
+
+    def next_due(self) -> Optional[float]:
+        while self.heap and not self._is_current(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def load(self, path: Path):
+        self.path = path
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logger.warning(f"{path} 解析错误，已忽略")
+            return
+        now = time.time()
+        for entry in entries:
+            release_time = entry["release_time"]
+            if release_time <= now - MISSED_GRACE:
+                continue
+            seq = next(self._seq)
+            entry["seq"] = seq
+            self.entries[entry["key"]] = entry
+            heapq.heappush(self.heap, (release_time, seq, entry["key"]))
+        logger.info(f"Recovered {len(self.entries)} live notifications from {path}")
+
+    def save(self, force: bool = False):
+        if not self.path or not self._dirty:
+            return
+        if not force and time.monotonic() - self._saved_at < SAVE_INTERVAL:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(list(self.entries.values()), f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            # 重启恢复的过期项也会在这里立即发出
+            for entry in self.pop_due(time.time()):
+                try:
+                    await self.send(entry)
+                except Exception as e:
+                    logger.error(f"Send live notice for {entry['key']} failed: {e!r}")
+            self.save()
+
+            next_due = self.next_due()
+            delay = MAX_SLEEP if next_due is None else next_due - time.time()
+            if self._dirty:
+                delay = min(delay, SAVE_INTERVAL)
+            if delay <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(delay, MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from nonebot.log import logger
+
+from .credentials import Credential, credential_pool
+
+T = TypeVar("T")
+
+# B站风控返回的业务码 / HTTP 状态码
+RISK_CODES = {-352, -412, -509, -799}
+RISK_STATUS = {412, 429}
+
+# 接口族 -> (初始速率, 最大速率)，单位 次/秒
+FAMILY_RATES: Dict[str, Tuple[float, float]] = {
+    "search": (0.5, 1.0),
+    "relation": (4.0, 8.0),
+    "card": (4.0, 8.0),
+    "medal": (2.0, 4.0),
+    "live": (2.0, 4.0),
+}
+MIN_RATE = 0.05
+MAX_RETRIES = 3
+
+
+class RiskControlError(Exception):
+    def __init__(self, code: int, retry_after: Optional[float] = None):
+        super().__init__(f"bilibili risk control: {code}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """令牌桶限速，触发风控时速率减半并暂停（AIMD），之后线性恢复；请求排队而不丢弃"""
+
+    def __init__(self, name: str, rate: float, max_rate: float):
+        self.name = name
+        self.rate = rate
+        self.max_rate = max_rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._strikes = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        capacity = max(1.0, self.rate)
+        self._tokens = min(capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # asyncio.Lock 按先来后到唤醒，等待者依次排队
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def success(self):
+        self._strikes = 0
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def throttled(self, retry_after: Optional[float] = None):
+        self._strikes += 1
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self._tokens = 0.0
+        pause = retry_after or min(5 * 2 ** (self._strikes - 1), 300)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        logger.warning(
+            f"{self.name} 触发风控，速率降至 {self.rate:.2f}/s，暂停 {pause:.0f}s"
+        )
+
+
+limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(family: str, cred: Credential) -> AdaptiveLimiter:
+    # 每个账号各自一组限速器，总吞吐随健康账号数增长
+    key = f"{family}#{cred.index}"
+    if key not in limiters:
+        rate, max_rate = FAMILY_RATES.get(family, (1.0, 2.0))
+        limiters[key] = AdaptiveLimiter(key, rate, max_rate)
+    return limiters[key]
+
+
+def risk_control(e: Exception) -> Optional[RiskControlError]:
+    if isinstance(e, RiskControlError):
+        return e
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in RISK_STATUS:
+        retry_after = e.response.headers.get("Retry-After", "")
+        return RiskControlError(
+            e.response.status_code,
+            float(retry_after) if retry_after.isdigit() else None,
+        )
+    # bilireq 的 ResponseCodeError 等带 code 的异常
+    code = getattr(e, "code", None)
+    if code in RISK_CODES:
+        return RiskControlError(code)
+    return None
+
+
+def check_risk(result: dict):
+    if result.get("code") in RISK_CODES:
+        raise RiskControlError(result["code"])
+
+
+async def limited(
+    family: str,
+    func: Callable[[Credential], Awaitable[T]],
+    cred: Optional[Credential] = None,
+) -> T:
+    """限速执行请求；传入 cred 时固定使用该账号（如翻页），否则每次重试换号"""
+    for _ in range(MAX_RETRIES):
+        current = cred or credential_pool.acquire()
+        limiter = get_limiter(family, current)
+        await limiter.acquire()
+        try:
+            result = await func(current)
+        except Exception as e:
+            if not (error := risk_control(e)):
+                raise
+            limiter.throttled(error.retry_after)
+            credential_pool.report_risk(current, error.retry_after)
+            continue
+        limiter.success()
+        credential_pool.report_ok(current)
+        return result
+    raise error
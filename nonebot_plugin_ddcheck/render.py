@@ -0,0 +1,171 @@
+import asyncio
+import base64
+import hashlib
+import json
+from pathlib import Path
+from typing import Awaitable, List, Optional
+
+import jinja2
+from nonebot import get_driver
+from nonebot.log import logger
+from nonebot_plugin_htmlrender import get_browser, html_to_pic
+
+from .cache import asset_cache, image_cache
+from .client import get_client
+from .config import ddcheck_config
+from .utils import run_background
+
+dir_path = Path(__file__).parent
+template_path = dir_path / "template"
+env = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(template_path), enable_async=True
+)
+
+# 模板改动后旧的缓存图片自动失效
+TEMPLATE_VERSION = hashlib.sha256(
+    b"".join(
+        (template_path / name).read_bytes() for name in ("info.html", "info_body.html")
+    )
+).hexdigest()
+
+# 注入内容后等待页面中的图片加载完成
+WAIT_IMAGES_JS = """
+() => Promise.all(Array.from(document.images).map(img => img.complete
+    ? null
+    : new Promise(resolve => { img.onload = img.onerror = resolve; })))
+"""
+
+
+class PagePool:
+    """预热好的浏览器页面池：模板样式和字体已加载，渲染时只注入数据"""
+
+    def __init__(self, size: int, max_uses: int):
+        self.size = max(size, 1)
+        self.max_uses = max(max_uses, 1)
+        self._sem = asyncio.Semaphore(self.size)
+        self._idle: List = []
+        self._uses = {}
+
+    async def _new_page(self):
+        browser = await get_browser()
+        page = await browser.new_page(
+            viewport={"width": 100, "height": 100}, device_scale_factor=2
+        )
+        shell = await env.get_template("info.html").render_async(info=None)
+        await page.set_content(shell, wait_until="networkidle")
+        self._uses[page] = 0
+        return page
+
+    async def _close_page(self, page):
+        self._uses.pop(page, None)
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def warm(self):
+        async with self._sem:
+            while len(self._idle) < self.size:
+                self._idle.append(await self._new_page())
+
+    async def render(self, body: str) -> bytes:
+        async with self._sem:
+            page = self._idle.pop() if self._idle else await self._new_page()
+            try:
+                await page.evaluate("html => { document.body.innerHTML = html; }", body)
+                await page.evaluate(WAIT_IMAGES_JS)
+                image = await page.screenshot(full_page=True, type="png")
+            except Exception:
+                await self._close_page(page)
+                raise
+            self._uses[page] += 1
+            if self._uses[page] >= self.max_uses:
+                # 定期回收页面，避免内存持续增长
+                await self._close_page(page)
+            else:
+                self._idle.append(page)
+            return image
+
+    async def close(self):
+        pages, self._idle = self._idle, []
+        for page in pages:
+            await self._close_page(page)
+
+
+page_pool = PagePool(
+    ddcheck_config.ddcheck_render_concurrency, ddcheck_config.ddcheck_render_recycle
+)
+
+driver = get_driver()
+
+
+@driver.on_startup
+async def _():
+    run_background(page_pool.warm())
+
+
+@driver.on_shutdown
+async def _():
+    await page_pool.close()
+
+
+def asset_url(url: str) -> str:
+    # B站图床支持按尺寸缩放，头像只需要卡片上的大小
+    if "hdslb.com" in url and "@" not in url:
+        return f"{url}@160w_160h_1c.webp"
+    return url
+
+
+async def inline_image(url: str) -> str:
+    """下载图片并转为 data URI，按 URL 缓存到磁盘；失败时返回原 URL"""
+    if not url or url.startswith("data:"):
+        return url
+    url = url.replace("http://", "https://", 1)
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    if data_uri := asset_cache.get(key):
+        return data_uri.decode("ascii")
+
+    try:
+        resp = await get_client(url).get(asset_url(url))
+        resp.raise_for_status()
+        mime = resp.headers.get("Content-Type", "").split(";")[0].strip()
+        if not mime.startswith("image/"):
+            raise ValueError(f"unexpected content type {mime!r}")
+    except Exception:
+        logger.opt(exception=True).warning(f"Get asset {url} failed")
+        return url
+    data_uri = to_data_uri(resp.content, mime)
+    asset_cache.set(key, data_uri.encode("ascii"))
+    return data_uri
+
+
+def to_data_uri(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def image_key(info: dict) -> str:
+    data = json.dumps(info, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{TEMPLATE_VERSION}:{data}".encode("utf-8")).hexdigest()
+
+
+async def render_html(info: dict, pool: Optional[PagePool] = page_pool) -> bytes:
+    if pool:
+        body = await env.get_template("info_body.html").render_async(info=info)
+        try:
+            return await pool.render(body)
+        except Exception:
+            logger.opt(exception=True).warning("页面池渲染失败，回退到 html_to_pic")
+    content = await env.get_template("info.html").render_async(info=info)
+    return await html_to_pic(content, wait=0, viewport={"width": 100, "height": 100})
+
+
+async def render_info(info: dict, face: Optional[Awaitable[str]] = None) -> bytes:
+    """face 为预先发起的头像下载，渲染时内联进模板，避免浏览器访问外网"""
+    key = image_key(info)
+    if image := image_cache.get(key):
+        return image
+    if face is not None:
+        info = {**info, "face": await face}
+    image = await render_html(info)
+    image_cache.set(key, image)
+    return image
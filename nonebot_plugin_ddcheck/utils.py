@@ -0,0 +1,93 @@
+import asyncio
+import codecs
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Set, TypeVar
+
+from nonebot.log import logger
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """同一个 key 的并发调用只执行一次，其余调用者等待同一个结果"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(func())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: 某个调用者被取消时不影响其他等待者
+        return await asyncio.shield(fut)
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+_background: Set[asyncio.Task] = set()
+
+
+def run_background(coro: Awaitable) -> asyncio.Task:
+    """后台运行，保留引用防止任务被回收，异常只记录日志"""
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+
+    def done(task: asyncio.Task):
+        _background.discard(task)
+        if not task.cancelled() and (exc := task.exception()):
+            logger.opt(exception=exc).warning("Background task failed")
+
+    task.add_done_callback(done)
+    return task
+
+
+class JsonArrayStream:
+    """增量解析顶层为对象数组的 json，边接收字节边产出元素"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._started = False
+        self.finished = False
+
+    def feed(self, chunk: bytes) -> Iterator[Any]:
+        self._buf += self._utf8.decode(chunk)
+        buf = self._buf
+        pos = 0
+        while not self.finished:
+            pos = _skip_ws(buf, pos)
+            if pos >= len(buf):
+                break
+            if not self._started:
+                if buf[pos] != "[":
+                    raise ValueError("expected a json array")
+                self._started = True
+                pos += 1
+                continue
+            if buf[pos] == ",":
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                self.finished = True
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # 元素不完整，等待更多数据
+            yield item
+            pos = end
+        self._buf = buf[pos:]
+
+
+def _skip_ws(buf: str, pos: int) -> int:
+    while pos < len(buf) and buf[pos] in " \t\r\n":
+        pos += 1
+    return pos
@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import httpx
+from nonebot.log import logger
+from nonebot_plugin_apscheduler import scheduler
+from nonebot_plugin_localstore import get_cache_dir
+
+from .client import get_client
+from .utils import JsonArrayStream, SingleFlight
+from .vtb_store import VERSION, VtbStore, export_json, import_json, write_store
+
+data_path = get_cache_dir("nonebot_plugin_ddcheck")
+vtb_list_path = data_path / "vtb_list.bin"
+vtb_json_path = data_path / "vtb_list.json"
+vtb_meta_path = data_path / "vtb_list.meta.json"
+
+
+class VtbRegistry:
+    """进程内的 VTuber 索引：mmap 的 VtbStore，以及 mid 集合"""
+
+    def __init__(self):
+        self._state: Tuple[Optional[VtbStore], FrozenSet[int]] = (None, frozenset())
+        self.loaded = False
+
+    @property
+    def store(self) -> Optional[VtbStore]:
+        return self._state[0]
+
+    @property
+    def mids(self) -> FrozenSet[int]:
+        return self._state[1]
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def __contains__(self, mid: int) -> bool:
+        return mid in self._state[1]
+
+    def get(self, mid: int) -> Optional[dict]:
+        store, mids = self._state
+        return store.get(mid) if mid in mids else None
+
+    def swap(self, store: Optional[VtbStore]):
+        mids = frozenset(store.mids()) if store else frozenset()
+        # 整体替换，读者看到的要么是旧表要么是新表
+        self._state = (store, mids)
+        self.loaded = True
+
+    def install(self, names: Dict[int, str]):
+        # 同步完成 关闭旧映射 -> 写入 -> 重新映射，中间不会有查询插入
+        old = self.store
+        if old:
+            old.close()
+        try:
+            dump_vtb_list(names)
+        finally:
+            self.swap(load_vtb_list())
+
+    def find_name(self, name: str) -> Optional[int]:
+        # 名字索引存在文件里，直接在映射上二分查找
+        store = self.store
+        return store.find_name(name) if store else None
+
+    def intersect(self, follows: Iterable[int]) -> List[dict]:
+        store, mids = self._state
+        return [store.get(mid) for mid in follows if mid in mids]
+
+
+registry = VtbRegistry()
+_flight = SingleFlight()
+
+
+VTB_MIRRORS = [
+    "https://api.vtbs.moe/v1/short",
+    "https://cfapi.vtbs.moe/v1/short",
+    "https://hkapi.vtbs.moe/v1/short",
+    "https://kr.vtbs.moe/v1/short",
+]
+
+
+class MirrorStat:
+    """镜像的延迟（EWMA）与健康状态，用来决定尝试顺序"""
+
+    def __init__(self):
+        self.latency = 1.0
+        self.failures = 0
+        self.down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def score(self) -> float:
+        return self.latency * (1 + self.failures)
+
+    def hedge_delay(self) -> float:
+        # 超过正常延迟的两倍还没返回，就同时请求下一个镜像
+        return min(max(self.latency * 2, 1.0), 5.0)
+
+    def success(self, elapsed: float):
+        self.latency = self.latency * 0.7 + elapsed * 0.3
+        self.failures = 0
+        self.down_until = 0.0
+
+    def failure(self, elapsed: float):
+        self.latency = max(self.latency, elapsed)
+        self.failures += 1
+        self.down_until = time.monotonic() + min(60 * 2**self.failures, 3600)
+
+    def cancelled(self, elapsed: float):
+        self.latency = max(self.latency, elapsed)
+
+
+mirror_stats: Dict[str, MirrorStat] = {url: MirrorStat() for url in VTB_MIRRORS}
+
+
+def load_meta() -> dict:
+    try:
+        with vtb_meta_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def dump_meta(meta: dict):
+    data_path.mkdir(parents=True, exist_ok=True)
+    with vtb_meta_path.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+async def fetch_mirror(
+    url: str, validators: dict
+) -> Tuple[Optional[Dict[int, str]], str, dict]:
+    """流式下载并解析，返回 (mid -> uname, sha256, 新的校验头)；未变化（304）时名单为 None"""
+    stat = mirror_stats[url]
+    headers = {}
+    if etag := validators.get("etag"):
+        headers["If-None-Match"] = etag
+    if last_modified := validators.get("last_modified"):
+        headers["If-Modified-Since"] = last_modified
+
+    start = time.monotonic()
+    names: Optional[Dict[int, str]] = None
+    digest = hashlib.sha256()
+    try:
+        async with get_client(url).stream(
+            "GET", url, headers=headers, timeout=20
+        ) as resp:
+            if resp.status_code != 304:
+                resp.raise_for_status()
+                names = {}
+                parser = JsonArrayStream()
+                async for chunk in resp.aiter_bytes():
+                    digest.update(chunk)
+                    for info in parser.feed(chunk):
+                        # 上游混用 uid / mid 两种字段，这里统一成 mid
+                        mid = info.get("mid", None) or info.get("uid", None)
+                        if mid and info.get("uname", None):
+                            names[int(mid)] = info["uname"]
+                if not parser.finished:
+                    raise ValueError("incomplete vtb list")
+                if not names:
+                    raise ValueError("empty vtb list")
+            new_validators = {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+            }
+            if resp.status_code == 304:
+                # 304 常常不带校验头，此时沿用之前的值
+                for key, value in validators.items():
+                    new_validators[key] = new_validators.get(key) or value
+    except asyncio.CancelledError:
+        stat.cancelled(time.monotonic() - start)
+        raise
+    except Exception:
+        stat.failure(time.monotonic() - start)
+        raise
+    stat.success(time.monotonic() - start)
+    return names, digest.hexdigest(), new_validators
+
+
+async def race_mirrors(
+    meta: dict,
+) -> Optional[Tuple[str, Optional[Dict[int, str]], str, dict]]:
+    order = sorted(
+        VTB_MIRRORS,
+        key=lambda url: (not mirror_stats[url].healthy, mirror_stats[url].score()),
+    )
+    conditional = vtb_list_path.exists()
+    validators = meta.get("validators", {}) if conditional else {}
+
+    tasks: Dict[asyncio.Task, str] = {}
+    try:
+        while order or tasks:
+            timeout = None
+            if order:
+                url = order.pop(0)
+                task = asyncio.create_task(fetch_mirror(url, validators.get(url, {})))
+                tasks[task] = url
+                if order:
+                    timeout = mirror_stats[url].hedge_delay()
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                url = tasks.pop(task)
+                if exc := task.exception():
+                    if isinstance(exc, httpx.TimeoutException):
+                        logger.warning(f"Get {url} timeout")
+                    else:
+                        logger.opt(exception=exc).warning(
+                            f"Error when getting {url}, ignore"
+                        )
+                    continue
+                return url, *task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+    return None
+
+
+async def update_vtb_list():
+    meta = load_meta()
+    result = await race_mirrors(meta)
+    if not result:
+        logger.warning("所有vtb列表镜像均获取失败")
+        return
+    url, names, digest, validators = result
+    meta.setdefault("validators", {})[url] = validators
+
+    if names is None:
+        logger.info(f"vtb列表未变化 ({url} 304)")
+    elif digest == meta.get("sha256") and vtb_list_path.exists():
+        logger.info(f"vtb列表未变化 ({url})")
+    else:
+        registry.install(names)
+        meta["sha256"] = digest
+    dump_meta(meta)
+
+
+scheduler.add_job(
+    update_vtb_list,
+    "cron",
+    hour=3,
+    id="update_vtb_list",
+)
+
+
+def load_vtb_list() -> Optional[VtbStore]:
+    if not vtb_list_path.exists() and vtb_json_path.exists():
+        # 迁移旧版的 json 列表
+        try:
+            dump_vtb_list(import_json(vtb_json_path))
+        except Exception:
+            logger.warning("旧版vtb列表解析错误，将重新获取")
+    if vtb_list_path.exists():
+        try:
+            store = VtbStore(vtb_list_path)
+            if store.version < VERSION:
+                # 旧版文件没有名字索引，原地升级
+                names = {info["mid"]: info["uname"] for info in store}
+                store.close()
+                dump_vtb_list(names)
+                store = VtbStore(vtb_list_path)
+            return store
+        except Exception:
+            logger.warning("vtb列表解析错误，将重新获取")
+            vtb_list_path.unlink()
+    return None
+
+
+def dump_vtb_list(names: Dict[int, str]):
+    data_path.mkdir(parents=True, exist_ok=True)
+    write_store(vtb_list_path, names)
+
+
+def export_vtb_json(path: Path = vtb_json_path):
+    """导出为 json，方便调试"""
+    if registry.store:
+        export_json(registry.store, path)
+
+
+async def get_vtb_registry() -> VtbRegistry:
+    if not registry.loaded:
+        registry.swap(load_vtb_list())
+    if not registry:
+        # 列表为空时并发的请求共用同一次拉取
+        await _flight.do("update_vtb_list", update_vtb_list)
+    return registry
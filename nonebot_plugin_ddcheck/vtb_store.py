@@ -0,0 +1,154 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# 文件布局（小端）:
+#   header: magic(4s) version(H) reserved(H) count(Q)
+#   mids:   uint64 * count，升序
+#   offsets:uint32 * (count + 1)，names 中每个名字的起止位置
+#   names:  UTF-8 拼接的名字
+# 版本 2 起在 names 之后（按 8 字节对齐）追加名字索引:
+#   hashes: uint64 * count，名字哈希升序
+#   slots:  uint32 * count，对应名字在 mids 中的下标，哈希相同时升序
+MAGIC = b"DDVT"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQ")
+
+
+def name_hash(name: str) -> int:
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class VtbStore:
+    """内存映射的 vtb 列表，按 mid 二分查找，名字按需解码"""
+
+    def __init__(self, path: Path):
+        if sys.byteorder != "little":
+            raise ValueError("vtb store requires a little-endian host")
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, count = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version not in (1, VERSION):
+                raise ValueError(f"bad vtb store header in {path}")
+            view = memoryview(self._mm)
+            mids_end = HEADER.size + 8 * count
+            offsets_end = mids_end + 4 * (count + 1)
+            if len(view) < offsets_end:
+                raise ValueError(f"truncated vtb store {path}")
+            self._mids = view[HEADER.size : mids_end].cast("Q")
+            self._offsets = view[mids_end:offsets_end].cast("I")
+            names_end = offsets_end + self._offsets[count]
+            self._names = view[offsets_end:names_end]
+            if len(view) < names_end:
+                raise ValueError(f"truncated vtb store {path}")
+            if version >= 2:
+                hashes_start = _align(names_end)
+                hashes_end = hashes_start + 8 * count
+                slots_end = hashes_end + 4 * count
+                if len(view) < slots_end:
+                    raise ValueError(f"truncated vtb store {path}")
+                self._hashes = view[hashes_start:hashes_end].cast("Q")
+                self._slots = view[hashes_end:slots_end].cast("I")
+        except Exception:
+            self.close()
+            raise
+        self._count = count
+        self.version = version
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, mid: int) -> bool:
+        return self.index(mid) is not None
+
+    def index(self, mid: int) -> Optional[int]:
+        i = bisect_left(self._mids, mid)
+        if i < self._count and self._mids[i] == mid:
+            return i
+        return None
+
+    def name_at(self, i: int) -> str:
+        return str(self._names[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def find_name(self, name: str) -> Optional[int]:
+        """按名字哈希二分查找，重名时返回 mid 最小的"""
+        if self.version < 2:
+            raise ValueError("vtb store has no name index")
+        key = name_hash(name)
+        i = bisect_left(self._hashes, key)
+        while i < self._count and self._hashes[i] == key:
+            slot = self._slots[i]
+            if self.name_at(slot) == name:
+                return self._mids[slot]
+            i += 1
+        return None
+
+    def get(self, mid: int) -> Optional[dict]:
+        i = self.index(mid)
+        if i is None:
+            return None
+        return {"mid": mid, "uname": self.name_at(i)}
+
+    def mids(self) -> Iterator[int]:
+        return iter(self._mids)
+
+    def __iter__(self) -> Iterator[dict]:
+        for i, mid in enumerate(self._mids):
+            yield {"mid": mid, "uname": self.name_at(i)}
+
+    def close(self):
+        for attr in ("_mids", "_offsets", "_names", "_hashes", "_slots"):
+            view = self.__dict__.pop(attr, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+
+
+def write_store(path: Path, names: Dict[int, str]):
+    mids = array("Q", sorted(names))
+    offsets = array("I", [0])
+    blob = bytearray()
+    for mid in mids:
+        blob += names[mid].encode("utf-8")
+        offsets.append(len(blob))
+    index = sorted((name_hash(names[mid]), i) for i, mid in enumerate(mids))
+    hashes = array("Q", (h for h, _ in index))
+    slots = array("I", (i for _, i in index))
+    names_end = HEADER.size + 8 * len(mids) + 4 * (len(mids) + 1) + len(blob)
+
+    # 先写临时文件再替换，其他进程映射着的旧文件不受影响
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(mids)))
+        f.write(mids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+        f.write(bytes(_align(names_end) - names_end))
+        f.write(hashes.tobytes())
+        f.write(slots.tobytes())
+    os.replace(tmp_path, path)
+
+
+def import_json(path: Path) -> Dict[int, str]:
+    with path.open("r", encoding="utf-8") as f:
+        vtb_list = json.load(f)
+    return {int(info["mid"]): info["uname"] for info in vtb_list}
+
+
+def export_json(store: VtbStore, path: Path):
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(list(store), f, indent=4, ensure_ascii=False)